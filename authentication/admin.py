@@ -1,10 +1,51 @@
+from functools import lru_cache
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 from django.urls import reverse
+from django.template.loader import render_to_string
 from django.utils.safestring import mark_safe
 from django.db import models
+from django.db.models import Count, Prefetch
+from core.paginators import FasterAdminPaginator
+from bookings.models import Booking
 from .models import CustomUser
+from .tasks import chunked, export_users_csv, send_welcome_emails
+
+
+# Column markup templates, built once at import time
+_PREVIEW_TPL = '<img src="{}" width="40" height="40" style="border-radius: 50%; object-fit: cover;" />'
+_DISPLAY_TPL = (
+    '<div style="text-align: center;">'
+    '<img src="{}" width="150" height="150" style="border-radius: 10px; object-fit: cover; border: 2px solid #dee2e6;" />'
+    '<br><small style="color: #6c757d;">Profile Image</small></div>'
+)
+_DEVICE_INFO_TPL = (
+    '<div style="background: #f8f9fa; padding: 10px; border-radius: 5px; line-height: 1.5;">'
+    '<strong>Device Info:</strong><br>'
+    '{}</div>'
+)
+_DEVICE_INFO_ROW_TPL = '<strong>{}:</strong> {}<br>'
+
+# Static fragments have no arguments, so they are marked safe once
+_NO_IMAGE_HTML = mark_safe('<span style="color: #6c757d;">📷 No Image</span>')
+_NO_PROFILE_IMAGE_HTML = mark_safe('<span style="color: #6c757d;">📷 No Profile Image</span>')
+_IMAGE_ERROR_HTML = mark_safe('<span style="color: #dc3545;">❌ Image Error</span>')
+_IMAGE_PATH_ERROR_HTML = mark_safe('<span style="color: #dc3545;">❌ Image Error - Check file path</span>')
+_NO_DEVICE_INFO_HTML = mark_safe('<em style="color: #6c757d;">No device info recorded</em>')
+
+
+# Rendered column HTML depends only on the values passed in, so it is cached
+# per distinct value instead of being re-escaped for every row on every page.
+@lru_cache(maxsize=4096)
+def _user_image_preview_html(image_url):
+    return format_html(_PREVIEW_TPL, image_url)
+
+
+@lru_cache(maxsize=4096)
+def _user_image_display_html(image_url):
+    return format_html(_DISPLAY_TPL, image_url)
 
 
 @admin.register(CustomUser)
@@ -12,14 +53,18 @@ class CustomUserAdmin(UserAdmin):
     model = CustomUser
     list_display = ('email', 'full_name', 'is_staff', 'is_active', 'is_fingerprint_enabled',
                     'user_image_preview', 'date_joined', 'last_login')
-    list_filter = ('is_staff', 'is_active', 'is_superuser',
-                   'is_fingerprint_enabled', 'date_joined', 'last_login')
+    _LIST_FILTER_BASE = ('is_staff', 'is_active', 'is_superuser',
+                         'is_fingerprint_enabled', 'date_joined', 'last_login')
+    _LIST_FILTER_SUPERUSER = _LIST_FILTER_BASE + ('groups',)
+    list_filter = _LIST_FILTER_BASE
     search_fields = ('email', 'full_name', 'first_name', 'last_name')
     ordering = ('-date_joined',)
     readonly_fields = ('date_joined', 'last_login',
                        'user_image_display', 'device_info_display', 'user_stats')
     list_editable = ('is_active', 'is_fingerprint_enabled')
     list_per_page = 25
+    paginator = FasterAdminPaginator
+    show_full_result_count = False
     date_hierarchy = 'date_joined'
 
     fieldsets = (
@@ -57,164 +102,161 @@ class CustomUserAdmin(UserAdmin):
         """Display small user image in list view"""
         if obj.user_image_url:
             try:
-                return format_html(
-                    '<img src="{}" width="40" height="40" style="border-radius: 50%; object-fit: cover;" />',
+                return _user_image_preview_html(
                     obj.user_image_url.url if hasattr(
-                        obj.user_image_url, 'url') else obj.user_image_url
+                        obj.user_image_url, 'url') else str(obj.user_image_url)
                 )
             except:
-                return format_html('<span style="color: #dc3545;">❌ Image Error</span>')
-        return format_html('<span style="color: #6c757d;">📷 No Image</span>')
+                return _IMAGE_ERROR_HTML
+        return _NO_IMAGE_HTML
     user_image_preview.short_description = "Profile"
 
     def user_image_display(self, obj):
         """Display large user image in detail view"""
         if obj.user_image_url:
             try:
-                return format_html(
-                    '<div style="text-align: center;">'
-                    '<img src="{}" width="150" height="150" style="border-radius: 10px; object-fit: cover; border: 2px solid #dee2e6;" />'
-                    '<br><small style="color: #6c757d;">Profile Image</small></div>',
+                return _user_image_display_html(
                     obj.user_image_url.url if hasattr(
-                        obj.user_image_url, 'url') else obj.user_image_url
+                        obj.user_image_url, 'url') else str(obj.user_image_url)
                 )
             except:
-                return format_html('<span style="color: #dc3545;">❌ Image Error - Check file path</span>')
-        return format_html('<span style="color: #6c757d;">📷 No Profile Image</span>')
+                return _IMAGE_PATH_ERROR_HTML
+        return _NO_PROFILE_IMAGE_HTML
     user_image_display.short_description = "Profile Image"
 
     def device_info_display(self, obj):
         """Display login device information in a formatted way"""
-        if obj.login_device_info:
-            device_info = obj.login_device_info
+        if isinstance(obj.login_device_info, dict) and obj.login_device_info:
             return format_html(
-                '<div style="background: #f8f9fa; padding: 10px; border-radius: 5px; line-height: 1.5;">'
-                '<strong>Device Info:</strong><br>'
-                '{}</div>',
-                '<br>'.join(
-                    [f'<strong>{k}:</strong> {v}' for k, v in device_info.items()])
+                _DEVICE_INFO_TPL,
+                format_html_join('', _DEVICE_INFO_ROW_TPL, obj.login_device_info.items()),
             )
-        return format_html('<em style="color: #6c757d;">No device info recorded</em>')
+        return _NO_DEVICE_INFO_HTML
     device_info_display.short_description = "Login Device Info"
 
     def user_stats(self, obj):
         """Display user statistics (bookings, activity, etc.)"""
         try:
-            # Get user-related statistics
-            from customers.models import Customer
-            from bookings.models import Booking
-
-            stats_html = '<div style="background: #f8f9fa; padding: 10px; border-radius: 5px; line-height: 1.5;">'
-
-            # Check if user has a customer profile
-            try:
-                customer = Customer.objects.get(user=obj)
-                total_bookings = customer.total_bookings
-                total_spent = customer.total_spent
-
-                stats_html += f'<strong>Customer Profile:</strong> ✅<br>'
-                stats_html += f'<strong>Total Bookings:</strong> {total_bookings}<br>'
-                stats_html += f'<strong>Total Spent:</strong> ₹{total_spent:,.2f}<br>'
-
-                # Get recent booking activity
-                recent_bookings = Booking.objects.filter(
-                    customer=customer).order_by('-created_at')[:3]
-                if recent_bookings:
-                    stats_html += '<strong>Recent Bookings:</strong><br>'
-                    for booking in recent_bookings:
-                        stats_html += f'• {booking.booking_id} ({booking.start_date})<br>'
-
-            except Customer.DoesNotExist:
-                stats_html += '<strong>Customer Profile:</strong> ❌ Not linked<br>'
-
-            # User account info
-            stats_html += f'<strong>Staff User:</strong> {"✅" if obj.is_staff else "❌"}<br>'
-            stats_html += f'<strong>Superuser:</strong> {"✅" if obj.is_superuser else "❌"}<br>'
-            stats_html += f'<strong>Groups:</strong> {obj.groups.count()}<br>'
-
-            stats_html += '</div>'
-            return format_html(stats_html)
+            # Customer profile and recent bookings are loaded by get_queryset
+            customer = getattr(obj, 'customer_profile', None)
+            return render_to_string('admin/authentication/user_stats.html', {
+                'obj': obj,
+                'customer': customer,
+                'recent_bookings': customer.recent_bookings_cached if customer is not None else [],
+                'groups_count': obj._groups_count,
+            })
 
         except Exception as e:
             return format_html('<span style="color: #dc3545;">Error loading stats: {}</span>', str(e))
     user_stats.short_description = "User Statistics"
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related().prefetch_related('groups', 'user_permissions')
+        """Trim changelist columns; load customer profile, recent bookings and group data on the change form only"""
+        qs = super().get_queryset(request)
+        match = request.resolver_match
+        url_name = match.url_name if match and match.url_name else ''
+        if url_name.endswith('_changelist'):
+            qs = qs.only(
+                'id', 'email', 'full_name', 'is_staff', 'is_active', 'is_fingerprint_enabled',
+                'user_image_url', 'date_joined', 'last_login'
+            )
+        elif url_name.endswith('_change'):
+            qs = qs.select_related('customer_profile').prefetch_related(
+                Prefetch(
+                    'customer_profile__bookings',
+                    queryset=Booking.objects.only('id', 'customer', 'booking_id', 'start_date', 'created_at')
+                    .order_by('-created_at')[:3],
+                    to_attr='recent_bookings_cached'
+                ),
+                'groups', 'user_permissions'
+            ).annotate(_groups_count=Count('groups', distinct=True))
+        return qs
 
     # Custom Actions
     actions = ['activate_users', 'deactivate_users', 'enable_fingerprint', 'disable_fingerprint',
                'make_staff', 'remove_staff', 'send_welcome_email', 'export_user_data']
 
+    def _bulk_set(self, queryset, field, value):
+        """Set one column in one UPDATE, skipping rows that already match"""
+        return queryset.exclude(**{field: value}).update(**{field: value})
+
     def activate_users(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = self._bulk_set(queryset, 'is_active', True)
         self.message_user(
             request, f'✅ {updated} users were successfully activated.')
     activate_users.short_description = "✅ Activate selected users"
 
     def deactivate_users(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = self._bulk_set(queryset, 'is_active', False)
         self.message_user(
             request, f'❌ {updated} users were successfully deactivated.')
     deactivate_users.short_description = "❌ Deactivate selected users"
 
     def enable_fingerprint(self, request, queryset):
-        updated = queryset.update(is_fingerprint_enabled=True)
+        updated = self._bulk_set(queryset, 'is_fingerprint_enabled', True)
         self.message_user(
             request, f'👆 Fingerprint enabled for {updated} users.')
     enable_fingerprint.short_description = "👆 Enable fingerprint authentication"
 
     def disable_fingerprint(self, request, queryset):
-        updated = queryset.update(is_fingerprint_enabled=False)
+        updated = self._bulk_set(queryset, 'is_fingerprint_enabled', False)
         self.message_user(
             request, f'🚫 Fingerprint disabled for {updated} users.')
     disable_fingerprint.short_description = "🚫 Disable fingerprint authentication"
 
     def make_staff(self, request, queryset):
-        updated = queryset.update(is_staff=True)
+        updated = self._bulk_set(queryset, 'is_staff', True)
         self.message_user(request, f'👑 {updated} users granted staff access.')
     make_staff.short_description = "👑 Grant staff access"
 
     def remove_staff(self, request, queryset):
         # Don't remove staff from superusers
-        updated = queryset.filter(is_superuser=False).update(is_staff=False)
+        updated = self._bulk_set(queryset.filter(is_superuser=False), 'is_staff', False)
         self.message_user(
             request, f'👤 Staff access removed from {updated} users (superusers skipped).')
     remove_staff.short_description = "👤 Remove staff access"
 
     def send_welcome_email(self, request, queryset):
-        # Placeholder for email functionality
-        count = queryset.count()
+        # Emails are sent by a background worker in batches
+        ids = list(queryset.values_list('pk', flat=True))
+        for batch in chunked(ids):
+            send_welcome_emails.delay(batch)
         self.message_user(
-            request, f'📧 Welcome email functionality ready for {count} users.')
+            request, f'📧 Welcome email queued for {len(ids)} users.')
     send_welcome_email.short_description = "📧 Send welcome email"
 
     def export_user_data(self, request, queryset):
-        # Placeholder for export functionality
-        count = queryset.count()
+        # The CSV is built by a background worker and emailed to the requester
+        ids = list(queryset.values_list('pk', flat=True))
+        export_users_csv.delay(ids, request.user.pk)
         self.message_user(
-            request, f'📊 Export functionality ready for {count} users.')
+            request, f'📊 Export of {len(ids)} users queued, a download link will be emailed to you.')
     export_user_data.short_description = "📊 Export user data"
 
     def save_model(self, request, obj, form, change):
         """Override to handle custom logic when saving users"""
         if not change:  # Creating new user
             # You can add logic here for new user creation
-            pass
-        super().save_model(request, obj, form, change)
+            super().save_model(request, obj, form, change)
+            return
+
+        # Only write the columns the form actually changed; m2m fields are
+        # saved separately by save_related()
+        concrete_fields = {f.name for f in obj._meta.concrete_fields}
+        obj.save(update_fields=[name for name in form.changed_data if name in concrete_fields])
 
     # Custom list filters
     def get_list_filter(self, request):
-        list_filter = list(self.list_filter)
-
         # Add custom filters based on user role
-        if request.user.is_superuser:
-            list_filter.append('groups')
-
-        return tuple(list_filter)
+        return self._LIST_FILTER_SUPERUSER if request.user.is_superuser else self._LIST_FILTER_BASE
 
     # Customize form display based on user permissions
     def get_fieldsets(self, request, obj=None):
+        key = f'_cu_fieldsets_{obj.pk if obj else None}'
+        cached = getattr(request, key, None)
+        if cached is not None:
+            return cached
+
         fieldsets = list(self.fieldsets)
 
         # If user is not superuser, limit permission access
@@ -227,9 +269,15 @@ class CustomUserAdmin(UserAdmin):
                     })
                     break
 
-        return fieldsets
+        setattr(request, key, tuple(fieldsets))
+        return getattr(request, key)
 
     def get_readonly_fields(self, request, obj=None):
+        key = f'_cu_readonly_fields_{obj.pk if obj else None}'
+        cached = getattr(request, key, None)
+        if cached is not None:
+            return cached
+
         readonly_fields = list(self.readonly_fields)
 
         # If editing existing user and not superuser, make certain fields readonly
@@ -237,7 +285,8 @@ class CustomUserAdmin(UserAdmin):
             readonly_fields.extend(
                 ['is_staff', 'is_superuser', 'groups', 'user_permissions'])
 
-        return readonly_fields
+        setattr(request, key, tuple(readonly_fields))
+        return getattr(request, key)
 
     # Add custom CSS and JS
     class Media:
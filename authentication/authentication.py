@@ -0,0 +1,89 @@
+import hashlib
+import threading
+import time
+
+from cachetools import TTLCache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Validated tokens are reused for a few seconds to skip repeated HMAC checks
+# and JSON decoding when a client fires several requests in a burst.
+TOKEN_CACHE_TTL = 5
+TOKEN_CACHE_SIZE = 4096
+
+# JSON column only BiometricToggleView reads from request.user, and it loads
+# the column itself when needed; other views never fetch it
+DEFERRED_USER_FIELDS = ('login_device_info',)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication with a short-lived, process-local cache of validated tokens.
+
+    Entries are keyed by a BLAKE2b digest of the raw token and are never
+    returned once the token's ``exp`` claim has passed.
+    """
+    _token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+    _token_cache_lock = threading.Lock()
+
+    def get_validated_token(self, raw_token):
+        """
+        Return a validated token, reusing a recent validation when possible.
+
+        Args:
+            raw_token (bytes): Token taken from the Authorization header.
+
+        Returns:
+            Token: The validated access token.
+        """
+        key = hashlib.blake2b(raw_token, digest_size=16).digest()
+        with self._token_cache_lock:
+            token = self._token_cache.get(key)
+
+        if token is not None and token.get('exp', 0) > time.time():
+            return token
+
+        token = super().get_validated_token(raw_token)
+        with self._token_cache_lock:
+            self._token_cache[key] = token
+        return token
+
+    def get_user(self, validated_token):
+        """
+        Return the token's user, leaving DEFERRED_USER_FIELDS unloaded.
+
+        Mirrors JWTAuthentication.get_user().
+
+        Args:
+            validated_token (Token): The validated access token.
+
+        Returns:
+            CustomUser: The authenticated user.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = self.user_model.objects.defer(*DEFERRED_USER_FIELDS).get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .hashers import verify_password_cached
+
+UserModel = get_user_model()
+
+
+class EmailBackend(ModelBackend):
+    """
+    ModelBackend that matches the email case-insensitively and reuses recent password checks.
+
+    Emails are stored lowercased, so the lookup is a plain equality on the
+    unique index. Inactive users are rejected before the password is hashed.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        """
+        Return the user for the given email and password, or None.
+
+        Args:
+            request (HttpRequest): The current request, if any.
+            username (str): The user's email address.
+            password (str): The raw password.
+        Returns:
+            CustomUser | None: The authenticated user.
+        """
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get(email=username.strip().lower())
+        except UserModel.DoesNotExist:
+            # Run the hasher once to reduce the timing difference between an
+            # existing and a nonexistent user, as ModelBackend does
+            UserModel().set_password(password)
+            return None
+        if self.user_can_authenticate(user) and verify_password_cached(user, password):
+            return user
+        return None
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-15 23:40
+
+from django.db import migrations
+from django.db.models.functions import Lower
+
+
+def lowercase_emails(apps, schema_editor):
+    CustomUser = apps.get_model('authentication', 'CustomUser')
+    CustomUser.objects.exclude(email=Lower('email')).update(email=Lower('email'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_customuser_user_dj_desc_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractUser
 from .managers import CustomUserManager  
 
@@ -40,6 +41,13 @@ class CustomUser(AbstractUser):
             self.email = self.email.lower()
         super().save(*args, **kwargs)
 
+    @property
+    def profile_cache_key(self):
+        """
+        Cache key under which the serialized profile of this user is stored.
+        """
+        return f'user_profile:{self.pk}'
+
     def __str__(self):
         """
         Return the string representation of the user.
@@ -48,3 +56,11 @@ class CustomUser(AbstractUser):
             str: The user's email address.
         """
         return self.email
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['-date_joined'], name='user_dj_desc_idx'),
+            models.Index(fields=['is_active', 'is_staff'], name='user_active_staff_idx'),
+            models.Index(fields=['is_fingerprint_enabled'], condition=Q(is_fingerprint_enabled=True),
+                         name='user_fp_partial_idx'),
+        ]
@@ -0,0 +1,48 @@
+""" API Response Envelope """
+import orjson
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def envelope(data=None, message="", status_code=status.HTTP_200_OK):
+    """
+    Build the standard {"data", "message", "status_code"} API response.
+
+    Args:
+        data: Payload returned under "data".
+        message (str): Human readable status message.
+        status_code (int): HTTP status, also echoed in the body.
+    Returns:
+        Response: DRF response carrying the envelope.
+    """
+    return Response({
+        "data": data,
+        "message": message,
+        "status_code": status_code,
+    }, status=status_code)
+
+
+def static_envelope(body, status_code):
+    """
+    Return a response for a pre-rendered envelope body, bypassing DRF rendering.
+    """
+    return HttpResponse(body, content_type="application/json", status=status_code)
+
+
+def _render_error(message):
+    """
+    Serialize a fixed 400 envelope once, at import time.
+    """
+    return orjson.dumps({
+        "data": None,
+        "message": message,
+        "status_code": status.HTTP_400_BAD_REQUEST,
+    })
+
+
+# Pre-rendered bodies for the most frequent fixed error responses
+ERR_REFRESH_REQUIRED = _render_error("Refresh token required for logout.")
+ERR_INVALID_TOKEN = _render_error("Invalid token.")
+ERR_PASSWORDS_MISMATCH = _render_error("New passwords do not match.")
+ERR_INCORRECT_OLD_PASSWORD = _render_error("Incorrect old password.")
@@ -1,9 +1,86 @@
 from rest_framework import serializers
 from .models import CustomUser
-import base64
+import binascii
+import re
+import time
 import uuid
-from django.core.files.base import ContentFile
-from drf_extra_fields.fields import Base64ImageField 
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.cache import cache
+from drf_extra_fields.fields import Base64ImageField as DRFBase64ImageField
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# Matches the data URI prefix sent by the mobile app, e.g. "data:image/png;base64,"
+_DATA_URI_RE = re.compile(r'^data:image/([\w.+-]+);base64,')
+
+# Base64 characters decoded per step when streaming to disk (multiple of 4)
+_DECODE_CHUNK_SIZE = 65536
+
+# Seconds a "not blacklisted" database answer is reused for a refresh token
+BLACKLIST_NEGATIVE_CACHE_TTL = 120
+
+
+def blacklisted_jti_cache_key(jti):
+    """
+    Cache key marking a refresh token as logged out before its blacklist row is written.
+    """
+    return f'blacklisted_jti:{jti}'
+
+
+def flag_blacklisted(token):
+    """
+    Mark a refresh token as blacklisted in cache until it expires.
+
+    Args:
+        token (RefreshToken): The token being logged out or rotated.
+    """
+    flag_jti_blacklisted(token['jti'], token['exp'])
+
+
+def flag_jti_blacklisted(jti, exp):
+    """
+    Mark the refresh token with this jti as blacklisted in cache until ``exp``.
+
+    Args:
+        jti (str): The token's jti claim.
+        exp (int | float): The token's expiry as a Unix timestamp.
+    """
+    remaining = int(exp - time.time())
+    cache.set(blacklisted_jti_cache_key(jti), True, max(remaining, 1))
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    """
+    RefreshToken whose blacklist check consults the cache before the database.
+
+    The cache key holds True for flagged tokens and False for tokens the
+    database reported as not blacklisted; the False entries expire after
+    BLACKLIST_NEGATIVE_CACHE_TTL seconds. Saving a BlacklistedToken
+    overwrites the entry with True (see authentication.signals). Code that
+    writes BlacklistedToken rows without post_save, such as bulk_create(),
+    must call flag_jti_blacklisted() itself, or the token stays usable
+    until its False entry expires.
+    """
+
+    def check_blacklist(self):
+        """
+        Raise TokenError if the token is blacklisted, querying the database only on a cache miss.
+        """
+        key = blacklisted_jti_cache_key(self.payload['jti'])
+        flagged = cache.get(key)
+        if flagged:
+            raise TokenError('Token is blacklisted')
+        if flagged is None:
+            try:
+                super().check_blacklist()
+            except TokenError:
+                flag_blacklisted(self)
+                raise
+            cache.set(key, False, BLACKLIST_NEGATIVE_CACHE_TTL)
 
 class RegisterSerializer(serializers.ModelSerializer):
     """
@@ -17,6 +94,8 @@ class RegisterSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['email', 'full_name', 'password', 'user_image_url', 'is_fingerprint_enabled', 'login_device_info']
+        # The unique index on email is checked by the INSERT in create()
+        extra_kwargs = {'email': {'validators': []}}
 
     def validate_email(self, value):
         """
@@ -28,20 +107,30 @@ class RegisterSerializer(serializers.ModelSerializer):
         """
         Create and return a new CustomUser instance.
 
+        Duplicate emails are caught from the unique index instead of a
+        separate existence query before the INSERT.
+
         Args:
             validated_data (dict): Validated user data.
 
         Returns:
             CustomUser: The created user instance.
+
+        Raises:
+            serializers.ValidationError: If the email is already registered.
         """
-        user = CustomUser.objects.create_user(
-            email=validated_data['email'],
-            full_name=validated_data['full_name'],
-            password=validated_data['password'],
-            user_image_url=validated_data.get('user_image_url'),
-            is_fingerprint_enabled=validated_data.get('is_fingerprint_enabled', False),
-            login_device_info=validated_data.get('login_device_info')
-        )
+        try:
+            with transaction.atomic():
+                user = CustomUser.objects.create_user(
+                    email=validated_data['email'],
+                    full_name=validated_data['full_name'],
+                    password=validated_data['password'],
+                    user_image_url=validated_data.get('user_image_url'),
+                    is_fingerprint_enabled=validated_data.get('is_fingerprint_enabled', False),
+                    login_device_info=validated_data.get('login_device_info')
+                )
+        except IntegrityError:
+            raise serializers.ValidationError({'email': 'User with this email already exists.'})
         return user
 
 class BiometricToggleSerializer(serializers.ModelSerializer):
@@ -52,6 +141,26 @@ class BiometricToggleSerializer(serializers.ModelSerializer):
         model = CustomUser
         fields = ['is_fingerprint_enabled', 'login_device_info']
 
+    def update(self, instance, validated_data):
+        """
+        Write only the toggled columns with a single UPDATE.
+
+        Bypasses Model.save(), so the full row is not rewritten and no
+        save signals fire; neither field feeds the cached user profile.
+
+        Args:
+            instance (CustomUser): The user being updated.
+            validated_data (dict): Validated biometric settings.
+
+        Returns:
+            CustomUser: The updated user instance.
+        """
+        if validated_data:
+            CustomUser.objects.filter(pk=instance.pk).update(**validated_data)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+        return instance
+
 class ChangePasswordSerializer(serializers.Serializer):
     """
     Serializer for changing user password.
@@ -62,6 +171,62 @@ class ChangePasswordSerializer(serializers.Serializer):
     new_password1 = serializers.CharField(required=True, min_length=8)  # Minimum password length
     new_password2 = serializers.CharField(required=True, min_length=8)
     
+#--------serializer to handle base64 image
+
+class Base64ImageField(DRFBase64ImageField):
+    """
+    Custom field to handle base64-encoded image data.
+
+    Data URIs are matched with a precompiled pattern and decoded in a single
+    pass with ``binascii.a2b_base64``; any other payload falls back to the
+    drf-extra-fields implementation.
+    """
+    def get_file_name(self, decoded_file):
+        """
+        Generate a unique filename stem for the uploaded image.
+        """
+        return uuid.uuid4().hex
+
+    def to_internal_value(self, data):
+        """
+        Convert base64 image data to an uploaded file.
+
+        Args:
+            data (str): Base64-encoded image data, optionally as a data URI.
+
+        Returns:
+            File: Decoded and validated image file.
+        """
+        match = _DATA_URI_RE.match(data) if isinstance(data, str) else None
+        if match is None:
+            return super().to_internal_value(data)
+
+        ext = match.group(1).lower()
+        if ext not in self.ALLOWED_TYPES:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+
+        start = match.end()
+        file_name = f"{self.get_file_name(None)}.{ext}"
+        try:
+            # Large payloads without line breaks are decoded in 4-aligned chunks
+            # straight into a temporary file, like Django does for big uploads
+            if ((len(data) - start) * 3 // 4 > settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+                    and '\n' not in data and '\r' not in data):
+                upload = TemporaryUploadedFile(file_name, f'image/{ext}', 0, None)
+                for i in range(start, len(data), _DECODE_CHUNK_SIZE):
+                    upload.write(binascii.a2b_base64(data[i:i + _DECODE_CHUNK_SIZE]))
+                upload.size = upload.tell()
+                upload.seek(0)
+                data = upload
+            else:
+                data = SimpleUploadedFile(name=file_name, content=binascii.a2b_base64(data[start:]))
+        except (binascii.Error, ValueError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+
+        # Skip the mixin's decode step and go straight to image validation
+        return serializers.ImageField.to_internal_value(self, data)
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     """
     Serializer for retrieving and updating user profile information.
@@ -77,35 +242,15 @@ class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['email', 'full_name', 'user_image_url']
-        read_only_fields = ['email']  
+        read_only_fields = ['email']
 
-#--------serializer to handle base64 image
 
-class Base64ImageField(serializers.ImageField):
-    """
-    Custom field to handle base64-encoded image data.
+class CachedBlacklistTokenRefreshSerializer(TokenRefreshSerializer):
     """
-    def to_internal_value(self, data):
-        """
-        Convert base64 image data to a Django ContentFile.
-
-        Args:
-            data (str): Base64-encoded image data.
+    Token refresh serializer that also rejects tokens flagged in cache by logout.
 
-        Returns:
-            ContentFile: Decoded image file.
-        """
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')  # Split the data URI
-            ext = format.split('/')[-1]  # Extract extension (e.g., 'png')
-            
-            # Decode the Base64 string
-            decoded_file = base64.b64decode(imgstr)
-            
-            # Generate a unique filename
-            file_name = f"{uuid.uuid4()}.{ext}"
-            
-            # Create a Django ContentFile
-            data = ContentFile(decoded_file, name=file_name)
-        
-        return super().to_internal_value(data)
+    LogoutView writes the blacklist row from a background task, so the cache
+    flag covers the short window before that row exists. Tokens blacklisted
+    by rotation are flagged by the BlacklistedToken post_save receiver.
+    """
+    token_class = CachedBlacklistRefreshToken
@@ -0,0 +1,28 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .models import CustomUser
+from .serializers import flag_jti_blacklisted
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_profile_cache(sender, instance, **kwargs):
+    """
+    Drop the cached profile response whenever the user row changes.
+    """
+    cache.delete(instance.profile_cache_key)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def flag_blacklisted_token(sender, instance, created, **kwargs):
+    """
+    Flag a newly blacklisted refresh token in cache.
+
+    Replaces a cached "not blacklisted" answer, so the token is refused at
+    once and not only after that entry expires.
+    """
+    if created:
+        token = instance.token
+        flag_jti_blacklisted(token.jti, token.expires_at.timestamp())
@@ -0,0 +1,120 @@
+import csv
+import io
+
+from celery import shared_task
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMessage, send_mass_mail
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.exports import export_download_url, save_export
+
+from .models import CustomUser
+
+# Number of user ids carried by a single task message
+BATCH_SIZE = 500
+
+
+def chunked(ids, size=BATCH_SIZE):
+    """
+    Split a list of ids into lists of at most ``size`` items.
+    """
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+@shared_task
+def send_welcome_emails(user_ids):
+    """
+    Send the welcome email to each of the given users.
+
+    Args:
+        user_ids (list[int]): Primary keys of the users to email.
+
+    Returns:
+        int: Number of emails sent.
+    """
+    users = CustomUser.objects.filter(pk__in=user_ids).only('email', 'full_name')
+    messages = [
+        (
+            "Welcome to Car Rental",
+            f"Hi {user.full_name},\n\nYour Car Rental account ({user.email}) is ready to use.",
+            settings.DEFAULT_FROM_EMAIL,
+            [user.email],
+        )
+        for user in users
+    ]
+    return send_mass_mail(messages, fail_silently=False)
+
+
+@shared_task
+def export_users_csv(user_ids, requester_id):
+    """
+    Write the given users to a CSV file and email its link to the requester.
+
+    Args:
+        user_ids (list[int]): Primary keys of the users to export.
+        requester_id (int): Primary key of the staff user who requested the export.
+
+    Returns:
+        str: Storage path of the generated file.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['id', 'email', 'full_name', 'is_active', 'is_staff',
+                     'is_fingerprint_enabled', 'date_joined', 'last_login'])
+    users = CustomUser.objects.filter(pk__in=user_ids).order_by('pk').values_list(
+        'id', 'email', 'full_name', 'is_active', 'is_staff',
+        'is_fingerprint_enabled', 'date_joined', 'last_login'
+    )
+    for row in users.iterator():
+        writer.writerow(row)
+
+    path = save_export('users', ContentFile(buffer.getvalue().encode('utf-8')))
+
+    requester = CustomUser.objects.filter(pk=requester_id).only('email').first()
+    if requester:
+        EmailMessage(
+            subject="User export ready",
+            body=f"Your export of {len(user_ids)} users is available to staff at {export_download_url(path)}",
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[requester.email],
+        ).send(fail_silently=True)
+    return path
+
+
+@shared_task
+def blacklist_refresh_token(refresh_token):
+    """
+    Write the blacklist row for a refresh token handed in at logout.
+
+    Args:
+        refresh_token (str): The encoded refresh token.
+
+    Returns:
+        bool: True if the token was blacklisted, False if it had already expired.
+    """
+    try:
+        RefreshToken(refresh_token).blacklist()
+    except TokenError:
+        return False
+    return True
+
+
+@shared_task
+def blacklist_outstanding_tokens(token_ids):
+    """
+    Blacklist the given outstanding refresh tokens in one INSERT.
+
+    Args:
+        token_ids (list[int]): Primary keys of OutstandingToken rows.
+
+    Returns:
+        int: Number of tokens submitted.
+    """
+    BlacklistedToken.objects.bulk_create(
+        [BlacklistedToken(token_id=pk) for pk in token_ids],
+        ignore_conflicts=True,
+    )
+    return len(token_ids)
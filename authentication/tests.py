@@ -1,3 +1,394 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.admin import site
+from django.contrib.auth.hashers import Argon2PasswordHasher, make_password
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.exports import export_storage
+from .admin import CustomUserAdmin
+from .authentication import CachedJWTAuthentication
+from .hashers import PepperedArgon2PasswordHasher, verify_password_cached
+from .models import CustomUser
+from .serializers import CachedBlacklistRefreshToken, blacklisted_jti_cache_key
+from .tasks import export_users_csv
+
+
+class UserExportTests(TestCase):
+    """
+    export_users_csv keeps the CSV out of public media and serves it to staff only.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_superuser('admin@example.com', 'Admin', 'pw12345678')
+        cls.user = CustomUser.objects.create_user('user@example.com', 'User', 'pw12345678')
+
+    def setUp(self):
+        export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_root)
+        settings_override = override_settings(EXPORT_ROOT=export_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def export(self):
+        name = export_users_csv([self.user.pk], self.staff.pk)
+        body = mail.outbox[-1].body
+        return name, body.rsplit(' at ', 1)[1].strip()
+
+    def test_export_is_private_and_unguessable(self):
+        name, url = self.export()
+        self.assertTrue(export_storage.exists(name))
+        self.assertFalse(export_storage.path(name).startswith(os.path.abspath(settings.MEDIA_ROOT)))
+        self.assertNotIn('/media/', url)
+        self.assertEqual(url, f'/exports/{name}/')
+
+        other_name, _ = self.export()
+        self.assertNotEqual(name, other_name)
+
+    def test_staff_can_download(self):
+        _, url = self.export()
+        self.client.force_login(self.staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.startswith('id,email,'))
+        self.assertIn('user@example.com', content)
+
+    def test_anonymous_and_non_staff_are_refused(self):
+        _, url = self.export()
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_unknown_export_is_not_found(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/exports/users-missing.csv/').status_code, 404)
+
+
+class BiometricToggleTests(TestCase):
+    """
+    The biometric toggle echoes login_device_info, which token authentication defers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            'user@example.com', 'User', 'pw12345678', login_device_info={'os': 'iOS'}
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        )
+
+    def test_response_includes_stored_device_info(self):
+        # User lookup, deferred device info, UPDATE
+        with self.assertNumQueries(3):
+            response = self.client.patch(
+                '/api/authentication/biometric/toggle/', {'is_fingerprint_enabled': True}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['login_device_info'], {'os': 'iOS'})
+
+    def test_replacing_device_info_skips_loading_it(self):
+        # User lookup, UPDATE
+        with self.assertNumQueries(2):
+            response = self.client.patch(
+                '/api/authentication/biometric/toggle/', {'login_device_info': {'os': 'Android'}},
+                format='json',
+            )
+        self.assertEqual(response.json()['data']['login_device_info'], {'os': 'Android'})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.login_device_info, {'os': 'Android'})
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """
+    Validated access tokens are reused briefly, but never past expiry or for an inactive user.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('user@example.com', 'User', 'pw12345678')
+
+    def setUp(self):
+        CachedJWTAuthentication._token_cache.clear()
+        self.raw_token = str(RefreshToken.for_user(self.user).access_token).encode()
+        self.validate = mock.patch.object(
+            JWTAuthentication, 'get_validated_token', autospec=True,
+            side_effect=JWTAuthentication.get_validated_token,
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_repeat_validation_is_cached(self):
+        authentication = CachedJWTAuthentication()
+        first = authentication.get_validated_token(self.raw_token)
+        second = authentication.get_validated_token(self.raw_token)
+        self.assertIs(first, second)
+        self.assertEqual(self.validate.call_count, 1)
+
+    def test_other_tokens_are_validated_separately(self):
+        authentication = CachedJWTAuthentication()
+        authentication.get_validated_token(self.raw_token)
+        other = str(RefreshToken.for_user(self.user).access_token).encode()
+        authentication.get_validated_token(other)
+        self.assertEqual(self.validate.call_count, 2)
+
+    def test_expired_entry_is_validated_again(self):
+        authentication = CachedJWTAuthentication()
+        token = authentication.get_validated_token(self.raw_token)
+        with mock.patch('authentication.authentication.time.time', return_value=token['exp'] + 1):
+            authentication.get_validated_token(self.raw_token)
+        self.assertEqual(self.validate.call_count, 2)
+
+    def test_invalid_token_is_not_cached(self):
+        authentication = CachedJWTAuthentication()
+        for _ in range(2):
+            with self.assertRaises(InvalidToken):
+                authentication.get_validated_token(self.raw_token[:-2] + b'xx')
+        self.assertEqual(len(CachedJWTAuthentication._token_cache), 0)
+
+    def test_cached_token_still_checks_the_user(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.raw_token.decode()}')
+        self.assertEqual(client.get('/api/authentication/profile/').status_code, 200)
+
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(client.get('/api/authentication/profile/').status_code, 401)
+        self.assertEqual(self.validate.call_count, 1)
+
+
+@override_settings(
+    AUTH_PEPPER='test-pepper',
+    PASSWORD_HASHERS=[
+        'authentication.hashers.PepperedArgon2PasswordHasher',
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ],
+)
+class PasswordHashingTests(TestCase):
+    """
+    The peppered hasher and the cached password check.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('user@example.com', 'User', 'pw12345678')
+
+    def test_new_hashes_are_peppered(self):
+        self.assertTrue(self.user.password.startswith('argon2_peppered$'))
+        self.assertTrue(self.user.check_password('pw12345678'))
+        self.assertFalse(self.user.check_password('pw12345679'))
+
+    def test_hash_needs_the_same_pepper(self):
+        with override_settings(AUTH_PEPPER='other-pepper'):
+            self.assertFalse(self.user.check_password('pw12345678'))
+
+    def test_pepper_is_mixed_in_before_hashing(self):
+        # Underneath is a plain Argon2 hash of the peppered password
+        plain = self.user.password.replace('argon2_peppered$', 'argon2$', 1)
+        pepper = PepperedArgon2PasswordHasher()._pepper
+        self.assertFalse(Argon2PasswordHasher().verify('pw12345678', plain))
+        self.assertTrue(Argon2PasswordHasher().verify(pepper('pw12345678'), plain))
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        self.user.password = make_password('pw12345678', hasher='md5')
+        self.user.save(update_fields=['password'])
+        self.assertTrue(verify_password_cached(self.user, 'pw12345678'))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('argon2_peppered$'))
+
+    def test_successful_check_is_cached(self):
+        self.assertTrue(verify_password_cached(self.user, 'pw12345678'))
+        with mock.patch.object(CustomUser, 'check_password') as check_password:
+            self.assertTrue(verify_password_cached(self.user, 'pw12345678'))
+        check_password.assert_not_called()
+
+    def test_failed_check_is_not_cached(self):
+        with mock.patch.object(CustomUser, 'check_password', return_value=False) as check_password:
+            self.assertFalse(verify_password_cached(self.user, 'wrong'))
+            self.assertFalse(verify_password_cached(self.user, 'wrong'))
+        self.assertEqual(check_password.call_count, 2)
+
+    def test_cached_check_ends_with_a_password_change(self):
+        self.assertTrue(verify_password_cached(self.user, 'pw12345678'))
+        self.user.set_password('new-password-1')
+        self.user.save(update_fields=['password'])
+        self.assertFalse(verify_password_cached(self.user, 'pw12345678'))
+        self.assertTrue(verify_password_cached(self.user, 'new-password-1'))
+
+    def test_cache_entries_do_not_hold_the_password(self):
+        with mock.patch('authentication.hashers.cache') as password_cache:
+            password_cache.get.return_value = None
+            verify_password_cached(self.user, 'pw12345678')
+        key = password_cache.set.call_args[0][0]
+        self.assertNotIn('pw12345678', key)
+        self.assertNotIn(self.user.password, key)
+
+    def test_empty_password_is_refused(self):
+        self.assertFalse(verify_password_cached(self.user, ''))
+        self.assertFalse(verify_password_cached(self.user, None))
+
+
+class RefreshTokenBlacklistTests(TestCase):
+    """
+    Blacklist checks go through the cache, including cached "not blacklisted" answers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('user@example.com', 'User', 'pw12345678')
+
+    def setUp(self):
+        cache.clear()
+        self.refresh = RefreshToken.for_user(self.user)
+
+    def refresh_status(self, token):
+        response = APIClient().post(
+            '/api/authentication/token/refresh/', {'refresh': str(token)}, format='json'
+        )
+        return response.status_code
+
+    def test_not_blacklisted_answer_is_cached(self):
+        with self.assertNumQueries(1):
+            CachedBlacklistRefreshToken(str(self.refresh))
+        self.assertIs(cache.get(blacklisted_jti_cache_key(self.refresh['jti'])), False)
+        with self.assertNumQueries(0):
+            CachedBlacklistRefreshToken(str(self.refresh))
+
+    def test_blacklist_row_overrides_cached_answer(self):
+        CachedBlacklistRefreshToken(str(self.refresh))
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=self.refresh['jti']))
+        with self.assertNumQueries(0), self.assertRaises(TokenError):
+            CachedBlacklistRefreshToken(str(self.refresh))
+        self.assertEqual(self.refresh_status(self.refresh), 401)
+
+    def test_blacklisted_in_database_is_flagged(self):
+        self.refresh.blacklist()
+        cache.clear()
+        with self.assertRaises(TokenError):
+            CachedBlacklistRefreshToken(str(self.refresh))
+        self.assertIs(cache.get(blacklisted_jti_cache_key(self.refresh['jti'])), True)
+
+    def test_rotated_token_is_refused(self):
+        self.assertEqual(self.refresh_status(self.refresh), 200)
+        self.assertEqual(self.refresh_status(self.refresh), 401)
+
+    def test_logout_refuses_token_before_row_is_written(self):
+        with mock.patch('authentication.views.blacklist_refresh_token.delay') as delay:
+            response = APIClient().post(
+                '/api/authentication/logout/', {'refresh': str(self.refresh)}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        delay.assert_called_once()
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertEqual(self.refresh_status(self.refresh), 401)
+
+
+class ChangePasswordTests(TestCase):
+    """
+    Changing the password signs out every refresh token issued before it.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('user@example.com', 'User', 'pw12345678')
+        self.tokens = [RefreshToken.for_user(self.user) for _ in range(2)]
+        self.other_user = CustomUser.objects.create_user('other@example.com', 'Other', 'pw12345678')
+        self.other_token = RefreshToken.for_user(self.other_user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens[0].access_token}')
+
+    def change_password(self, old_password='pw12345678'):
+        return self.client.post('/api/authentication/change-password/', {
+            'old_password': old_password,
+            'new_password1': 'new-password-1',
+            'new_password2': 'new-password-1',
+        }, format='json')
+
+    def refresh_status(self, token):
+        response = APIClient().post(
+            '/api/authentication/token/refresh/', {'refresh': str(token)}, format='json'
+        )
+        return response.status_code
+
+    def test_previous_refresh_tokens_are_revoked(self):
+        self.assertEqual(self.change_password().status_code, 200)
+        for token in self.tokens:
+            self.assertEqual(self.refresh_status(token), 401)
+        self.assertEqual(
+            set(BlacklistedToken.objects.values_list('token__jti', flat=True)),
+            {token['jti'] for token in self.tokens},
+        )
+        self.assertEqual(self.refresh_status(self.other_token), 200)
+
+    def test_wrong_old_password_revokes_nothing(self):
+        self.assertEqual(self.change_password('wrong-password').status_code, 400)
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertEqual(self.refresh_status(self.tokens[1]), 200)
+
+
+class CustomUserAdminActionTests(TestCase):
+    """
+    The flag actions update only rows that change, and never demote superusers.
+    """
+
+    def setUp(self):
+        self.admin_user = CustomUser.objects.create_superuser('admin@example.com', 'Admin', 'pw12345678')
+        self.users = [
+            CustomUser.objects.create_user(f'user{i}@example.com', 'User', 'pw12345678')
+            for i in range(3)
+        ]
+        self.client.force_login(self.admin_user)
+
+    def run_action(self, action, users):
+        return self.client.post(reverse('admin:authentication_customuser_changelist'), {
+            'action': action,
+            '_selected_action': [user.pk for user in users],
+        }, follow=True)
+
+    def test_bulk_set_skips_rows_that_already_match(self):
+        model_admin = CustomUserAdmin(CustomUser, site)
+        CustomUser.objects.filter(pk=self.users[0].pk).update(is_active=False)
+        queryset = CustomUser.objects.filter(pk__in=[user.pk for user in self.users])
+        self.assertEqual(model_admin._bulk_set(queryset, 'is_active', False), 2)
+        self.assertFalse(queryset.filter(is_active=True).exists())
+        self.assertEqual(model_admin._bulk_set(queryset, 'is_active', False), 0)
+
+    def test_deactivate_and_activate(self):
+        response = self.run_action('deactivate_users', self.users[:2])
+        self.assertContains(response, '2 users were successfully deactivated')
+        self.assertEqual(
+            list(CustomUser.objects.filter(pk__in=[u.pk for u in self.users]).order_by('pk')
+                 .values_list('is_active', flat=True)),
+            [False, False, True],
+        )
+        response = self.run_action('activate_users', self.users)
+        self.assertContains(response, '2 users were successfully activated')
+
+    def test_fingerprint_actions(self):
+        self.run_action('enable_fingerprint', self.users)
+        self.assertEqual(CustomUser.objects.filter(is_fingerprint_enabled=True).count(), 3)
+        self.run_action('disable_fingerprint', self.users[:1])
+        self.assertEqual(CustomUser.objects.filter(is_fingerprint_enabled=True).count(), 2)
+
+    def test_remove_staff_skips_superusers(self):
+        self.run_action('make_staff', self.users)
+        self.assertEqual(CustomUser.objects.filter(is_staff=True).count(), 4)
+        response = self.run_action('remove_staff', [self.admin_user, *self.users])
+        self.assertContains(response, 'Staff access removed from 3 users')
+        self.admin_user.refresh_from_db()
+        self.assertTrue(self.admin_user.is_staff)
+        self.assertEqual(CustomUser.objects.filter(is_staff=True).count(), 1)
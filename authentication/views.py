@@ -1,24 +1,44 @@
+import jwt
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
 from rest_framework.views import APIView
 
+from .hashers import verify_password_cached
 from .models import CustomUser
 from .serializers import( 
                          RegisterSerializer,
                          BiometricToggleSerializer,
                          ChangePasswordSerializer,
+                         UserProfileSerializer,
+                         CachedBlacklistRefreshToken,
+                         flag_blacklisted,
+                         flag_jti_blacklisted,
                          )
-
-from django.contrib.auth import update_session_auth_hash, authenticate, get_user_model
-from .serializers import UserProfileSerializer
+from .responses import (
+    ERR_INCORRECT_OLD_PASSWORD,
+    ERR_INVALID_TOKEN,
+    ERR_PASSWORDS_MISMATCH,
+    ERR_REFRESH_REQUIRED,
+    envelope,
+    static_envelope,
+)
+from .tasks import blacklist_outstanding_tokens, blacklist_refresh_token
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
 
 User = get_user_model()
 
+# Seconds a serialized user profile stays in cache
+PROFILE_CACHE_TIMEOUT = 60
+
 # Custom Token Serializer 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
@@ -28,10 +48,14 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     Raises custom error codes for invalid email or password.
     """
     username_field = 'email'
-     
+
     def validate(self, attrs):
         """
         Validate user credentials and generate JWT tokens.
+
+        Credentials are checked with one user lookup and one password hash.
+        super().validate() and authenticate() are intentionally not called,
+        as each would fetch the user and run the hasher again.
         Args:
             attrs (dict): Contains 'email' and 'password'.
         Returns:
@@ -39,13 +63,17 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         Raises:
             AuthenticationFailed: If authentication fails, raises with custom error codes.
         """
-        # Get email and password from input, strip spaces
-        email = attrs.get("email", "").strip()
+        # Get email and password from input, strip spaces; emails are stored
+        # lowercased, so a plain equality lookup can use the unique index
+        email = attrs.get("email", "").strip().lower()
         password = attrs.get("password")
 
-        # Try to find user with case-insensitive email lookup
+        # Find the user, loading only the columns needed to check the
+        # password and mint the token
         try:
-            user = User.objects.get(email__iexact=email)
+            user = User.objects.only(
+                'id', 'password', 'is_active', 'email'
+            ).get(email=email)
         except User.DoesNotExist:
             # No user found with this email
             raise AuthenticationFailed({
@@ -53,20 +81,23 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
                 "status_code": int(222)
             })
 
-        # Check password using Django's secure method
-        if not user.check_password(password):
+        # Check if user is active before paying for the password hash
+        if not user.is_active:
+            raise AuthenticationFailed({
+                "detail": "User is inactive",
+                "status_code": int(333)
+            })
+
+        # Check password, reusing a verification from the last minute
+        if not verify_password_cached(user, password):
             # Password is incorrect
             raise AuthenticationFailed({
                 "detail": "Invalid password",
                 "status_code": int(111)
             })
 
-        # Check if user is active
-        if not user.is_active:
-            raise AuthenticationFailed({
-                "detail": "User is inactive",
-                "status_code": int(333)
-            })
+        # Expose the user as TokenObtainSerializer.validate() would
+        self.user = user
 
         # Generate JWT tokens for the authenticated user
         refresh = self.get_token(user)
@@ -99,21 +130,13 @@ class RegisterView(generics.CreateAPIView):
         """
         serializer = self.get_serializer(data=request.data)
         if not serializer.is_valid():
-            return Response({
-                "data": None,
-                "message": "Validation error",
-                "status_code": status.HTTP_400_BAD_REQUEST
-        
-
-        }, status=status.HTTP_400_BAD_REQUEST)
+            return envelope(None, "Validation error", status.HTTP_400_BAD_REQUEST)
 
-        self.perform_create(serializer)
-        return Response({
-            "data": serializer.data,
-            "message": "User registered successfully",
-            "status_code": status.HTTP_201_CREATED
-        }, status=status.HTTP_201_CREATED
-                        )
+        try:
+            self.perform_create(serializer)
+        except ValidationError:
+            return envelope(None, "Validation error", status.HTTP_400_BAD_REQUEST)
+        return envelope(serializer.data, "User registered successfully", status.HTTP_201_CREATED)
 
 #------Login
 class LoginView(TokenObtainPairView):
@@ -152,11 +175,7 @@ class LoginView(TokenObtainPairView):
             }, status=status.HTTP_401_UNAUTHORIZED)
 
         token = serializer.validated_data
-        return Response({
-            "data": token,
-            "message": "Login successful",
-            "status_code": status.HTTP_200_OK
-        }, status=status.HTTP_200_OK)
+        return envelope(token, "Login successful", status.HTTP_200_OK)
 
 
         
@@ -166,6 +185,8 @@ class LogoutView(APIView):
     API view for user logout and token blacklisting.
 
     Blacklists the provided refresh token to prevent further use.
+    The token is flagged in cache right away and the blacklist row is
+    written by a background task.
     """
     permission_classes = [AllowAny]
 
@@ -178,25 +199,16 @@ class LogoutView(APIView):
         """
         refresh_token = request.data.get("refresh")
         if not refresh_token:
-            return Response({
-                "data": None,
-                "message": "Refresh token required for logout.",
-                "status_code": status.HTTP_400_BAD_REQUEST
-            }, status=status.HTTP_400_BAD_REQUEST)
+            return static_envelope(ERR_REFRESH_REQUIRED, status.HTTP_400_BAD_REQUEST)
         try:
-            token = RefreshToken(refresh_token)
-            token.blacklist()
-            return Response({
-                "data": None,
-                "message": "Logout successful",
-                "status_code": status.HTTP_200_OK
-            }, status=status.HTTP_200_OK)
-        except Exception:
-            return Response({
-                "data": None,
-                "message": "Invalid token.",
-                "status_code": status.HTTP_400_BAD_REQUEST
-            }, status=status.HTTP_400_BAD_REQUEST)
+            # Reject malformed input before signature and blacklist checks
+            jwt.get_unverified_header(refresh_token)
+            token = CachedBlacklistRefreshToken(refresh_token)
+            flag_blacklisted(token)
+            blacklist_refresh_token.delay(refresh_token)
+            return envelope(None, "Logout successful", status.HTTP_200_OK)
+        except (jwt.PyJWTError, TokenError):
+            return static_envelope(ERR_INVALID_TOKEN, status.HTTP_400_BAD_REQUEST)
 
 #------Biometric Toggle           
 class BiometricToggleView(generics.UpdateAPIView):
@@ -215,8 +227,14 @@ class BiometricToggleView(generics.UpdateAPIView):
         Returns:
             CustomUser: The authenticated user instance.
         """
-        # Return the currently authenticated user
-        return self.request.user
+        # Return the currently authenticated user. CachedJWTAuthentication
+        # defers login_device_info; the response echoes it, so load it unless
+        # this request replaces it
+        user = self.request.user
+        if ('login_device_info' not in self.request.data
+                and 'login_device_info' in user.get_deferred_fields()):
+            user.refresh_from_db(fields=['login_device_info'])
+        return user
 
     def update(self, request, *args, **kwargs):
         """
@@ -230,11 +248,7 @@ class BiometricToggleView(generics.UpdateAPIView):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
-        return Response({
-            "data": serializer.data,
-            "message": "Biometric login settings updated successfully",
-            "status_code": status.HTTP_200_OK
-        }, status=status.HTTP_200_OK)
+        return envelope(serializer.data, "Biometric login settings updated successfully", status.HTTP_200_OK)
 
 
 #-----Change Password
@@ -243,6 +257,7 @@ class ChangePasswordView(generics.GenericAPIView):
     API view to handle password change for authenticated users.
 
     Validates old password and ensures new passwords match and meet minimum length requirements.
+    On success every refresh token previously issued to the user is blacklisted.
     """
     serializer_class = ChangePasswordSerializer
     permission_classes = [IsAuthenticated]
@@ -260,31 +275,27 @@ class ChangePasswordView(generics.GenericAPIView):
             new_password1 = serializer.validated_data['new_password1']
             new_password2 = serializer.validated_data['new_password2']
 
-            if not request.user.check_password(old_password):
-                return Response({
-                    "data": None,
-                    "message": "Incorrect old password.",
-                    "status_code": status.HTTP_400_BAD_REQUEST
-                }, status=status.HTTP_400_BAD_REQUEST)
-
+            # Compare the new passwords before running the slow password hash
             if new_password1 != new_password2:
-                return Response({
-                    "data": None,
-                    "message": "New passwords do not match.",
-                    "status_code": status.HTTP_400_BAD_REQUEST
-                }, status=status.HTTP_400_BAD_REQUEST)
+                return static_envelope(ERR_PASSWORDS_MISMATCH, status.HTTP_400_BAD_REQUEST)
+
+            if not verify_password_cached(request.user, old_password):
+                return static_envelope(ERR_INCORRECT_OLD_PASSWORD, status.HTTP_400_BAD_REQUEST)
 
             request.user.set_password(new_password1)
-            request.user.save()
+            request.user.save(update_fields=['password'])
 
-            # Update session to prevent logout after password change
-            update_session_auth_hash(request, request.user)
+            # Sign out every refresh token issued before the change; the cache
+            # flags apply at once, the blacklist rows are written by a task
+            outstanding = list(OutstandingToken.objects.filter(
+                user=request.user, expires_at__gt=timezone.now()
+            ).values_list('id', 'jti', 'expires_at'))
+            for _, jti, expires_at in outstanding:
+                flag_jti_blacklisted(jti, expires_at.timestamp())
+            if outstanding:
+                blacklist_outstanding_tokens.delay([pk for pk, _, _ in outstanding])
 
-            return Response({
-                "data": None,
-                "message": "Password changed successfully.",
-                "status_code": status.HTTP_200_OK
-            }, status=status.HTTP_200_OK)
+            return envelope(None, "Password changed successfully.", status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -306,3 +317,19 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
             CustomUser: The authenticated user instance.
         """
         return self.request.user
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Return the profile, served from cache when available.
+
+        The cache entry is dropped by a post_save signal on CustomUser.
+
+        Returns:
+            Response: Serialized profile data.
+        """
+        instance = self.get_object()
+        data = cache.get(instance.profile_cache_key)
+        if data is None:
+            data = self.get_serializer(instance).data
+            cache.set(instance.profile_cache_key, data, PROFILE_CACHE_TIMEOUT)
+        return Response(data)
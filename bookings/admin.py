@@ -1,38 +1,170 @@
+from functools import lru_cache
+
 from django.contrib import admin
 from django.utils.html import format_html
-from django.urls import reverse
-from django.db import models
+from django.utils.safestring import mark_safe
+from django.urls import get_script_prefix, reverse
+from django.db import models, transaction
+from django.db.models.signals import post_save
+from django.db.models import (
+    BooleanField, Count, Exists, ExpressionWrapper, F, OuterRef, Q,
+)
 from django.utils import timezone
 from django.contrib import messages
+from cars.models import Car
+from core.paginators import FasterAdminPaginator
 from .models import Booking, Payment, BookingExtension
-
-
-class PaymentInline(admin.TabularInline):
-    """Inline admin for booking payments"""
-    model = Payment
-    extra = 0
-    readonly_fields = ['created_at', 'created_by']
-    fields = ['amount', 'payment_method', 'payment_date',
-              'transaction_id', 'is_successful', 'notes', 'created_at']
-
-    def save_model(self, request, obj, form, change):
-        if not change:
-            obj.created_by = request.user
-        super().save_model(request, obj, form, change)
-
-
-class BookingExtensionInline(admin.TabularInline):
-    """Inline admin for booking extensions"""
-    model = BookingExtension
-    extra = 0
-    readonly_fields = ['created_at', 'created_by']
-    fields = ['previous_end_date', 'new_end_date',
-              'extension_fee', 'reason', 'remarks', 'created_at']
-
-    def save_model(self, request, obj, form, change):
-        if not change:
-            obj.created_by = request.user
-        super().save_model(request, obj, form, change)
+from .tasks import export_bookings_csv
+
+# Changelist cell markup. Colours are baked into the templates so only row
+# values are interpolated; cells built purely from numbers and dates use
+# %-formatting and mark_safe, as there is nothing in them to escape.
+_BOOKING_ID_TPL = (
+    '<div>'
+    '<strong style="color: #007cba;">{}</strong><br>'
+    '<small style="color: #666;">Created: {}</small>'
+    '</div>'
+)
+_LINK_WITH_SUBTITLE_TPL = (
+    '<div>'
+    '<a href="{}" style="color: #007cba; font-weight: bold;">{}</a><br>'
+    '<small style="color: #666;">{}</small>'
+    '</div>'
+)
+_CAR_LINK_TPL = (
+    '<div>'
+    '<a href="{}" style="color: #007cba; font-weight: bold;">{}{}</a><br>'
+    '<small style="color: #666;">₹{}/day</small>'
+    '</div>'
+)
+_DATE_RANGE_TPL = (
+    '<div style="text-align: center;">'
+    '<span style="color: %s; font-weight: bold;">%s</span><br>'
+    '<small style="color: #666;">to</small><br>'
+    '<span style="color: %s; font-weight: bold;">%s</span><br>'
+    '<small style="color: #666;">(%s days)</small>'
+    '</div>'
+)
+_TOTAL_AMOUNT_TPL = (
+    '<div style="text-align: right;">'
+    '<strong style="font-size: 14px;">₹%s</strong><br>'
+    '<small style="color: #666;">+ ₹%s charges</small>'
+    '</div>'
+)
+_BALANCE_DUE_TPL = (
+    '<div style="text-align: right; color: #dc3545;">'
+    '<strong style="font-size: 14px;">₹%s</strong><br>'
+    '<small>Due</small>'
+    '</div>'
+)
+_BALANCE_PAID_TPL = (
+    '<div style="text-align: right; color: #28a745;">'
+    '<strong style="font-size: 14px;">₹%s</strong><br>'
+    '<small>Paid</small>'
+    '</div>'
+)
+_DAYS_OVERDUE_TPL = (
+    '<div style="text-align: center;">'
+    '<strong>%s</strong> days<br>'
+    '<small style="color: #dc3545;">⚠️ %s days overdue</small>'
+    '</div>'
+)
+_DAYS_TPL = (
+    '<div style="text-align: center;">'
+    '<strong>%s</strong> days'
+    '</div>'
+)
+_AMOUNT_SUCCESS_TPL = (
+    '<div style="text-align: right;">'
+    '<strong style="color: #28a745; font-size: 14px;">₹%s</strong>'
+    '</div>'
+)
+_AMOUNT_FAILED_TPL = (
+    '<div style="text-align: right;">'
+    '<strong style="color: #dc3545; font-size: 14px;">₹%s</strong>'
+    '</div>'
+)
+_DATE_EXTENSION_TPL = (
+    '<div style="text-align: center;">'
+    '%s <br>→<br> %s<br>'
+    '<small style="color: #666;">(+%s days)</small>'
+    '</div>'
+)
+
+# Change form summaries
+_BOOKING_SUMMARY_TPL = (
+    '<div style="line-height: 1.6; padding: 15px; background: #f8f9fa; border-radius: 8px;">'
+    '<h4 style="margin-top: 0; color: #495057;">📋 Booking Overview</h4>'
+    '<div style="display: grid; grid-template-columns: 1fr 1fr; gap: 10px;">'
+    '<div><strong>Duration:</strong> {} days</div>'
+    '<div><strong>Daily Rate:</strong> ₹{}</div>'
+    '<div><strong>Car Returned:</strong> {}</div>'
+    '<div><strong>Has Accident:</strong> {}</div>'
+    '<div><strong>Car Swapped:</strong> {}</div>'
+    '<div><strong>Pickup Time:</strong> {}</div>'
+    '<div><strong>Dropoff Time:</strong> {}</div>'
+    '<div><strong>Actual Return:</strong> {}</div>'
+    '</div></div>'
+)
+_FINANCIAL_SUMMARY_TPL = (
+    '<div style="line-height: 1.6; padding: 15px; background: #f8f9fa; border-radius: 8px;">'
+    '<h4 style="margin-top: 0; color: #495057;">💰 Financial Breakdown</h4>'
+    '<table style="width: 100%; border-collapse: collapse;">'
+    '<tr><td><strong>Subtotal:</strong></td><td style="text-align: right;">₹{}</td></tr>'
+    '<tr><td><strong>Tax:</strong></td><td style="text-align: right;">₹{}</td></tr>'
+    '<tr><td><strong>Discount:</strong></td><td style="text-align: right; color: green;">-₹{}</td></tr>'
+    '<tr><td><strong>Extension Charges:</strong></td><td style="text-align: right;">₹{}</td></tr>'
+    '<tr><td><strong>Accident Charges:</strong></td><td style="text-align: right;">₹{}</td></tr>'
+    '<tr style="border-top: 2px solid #dee2e6;"><td><strong>Total Amount:</strong></td><td style="text-align: right;"><strong>₹{}</strong></td></tr>'
+    '<tr><td><strong>Paid Amount (DB):</strong></td><td style="text-align: right; color: green;">₹{}</td></tr>'
+    '<tr><td><strong>Calculated Paid:</strong></td><td style="text-align: right; color: blue;">₹{}</td></tr>'
+    '<tr style="border-top: 1px solid #dee2e6;"><td><strong>Balance Due:</strong></td><td style="text-align: right; color: {};">₹{}</td></tr>'
+    '</table></div>'
+)
+_ACCIDENT_SUMMARY_TPL = (
+    '<div style="line-height: 1.6; padding: 15px; background: #fff3cd; border-radius: 8px; border-left: 4px solid #ffc107;">'
+    '<h4 style="margin-top: 0; color: #856404;">⚠️ Accident Report</h4>'
+    '<p><strong>Date:</strong> {}</p>'
+    '<p><strong>Charges:</strong> ₹{}</p>'
+    '<p><strong>Description:</strong></p>'
+    '<p style="background: white; padding: 10px; border-radius: 4px;">{}</p>'
+    '</div>'
+)
+_SWAP_SUMMARY_TPL = (
+    '<div style="line-height: 1.6; padding: 15px; background: #d1ecf1; border-radius: 8px; border-left: 4px solid #17a2b8;">'
+    '<h4 style="margin-top: 0; color: #0c5460;">🔄 Car Swap Details</h4>'
+    '<p><strong>Original Car:</strong> {}</p>'
+    '<p><strong>Current Car:</strong> {}</p>'
+    '<p><strong>Swap Date:</strong> {}</p>'
+    '<p><strong>Reason:</strong> {}</p>'
+    '</div>'
+)
+
+
+# Change URLs differ only by primary key, so each pattern is reversed once
+# (per script prefix) and the key is spliced in for every row.
+@lru_cache(maxsize=None)
+def _change_url_parts(viewname, script_prefix):
+    head, tail = reverse(viewname, args=[0]).rsplit('/0/', 1)
+    return head + '/', '/' + tail
+
+
+def _change_url(viewname, pk):
+    head, tail = _change_url_parts(viewname, get_script_prefix())
+    return f'{head}{pk}{tail}'
+
+
+# Static fragments have no arguments, so they are marked safe once
+_NO_CUSTOMER_HTML = mark_safe('<span style="color: #dc3545;">❌ No Customer</span>')
+_NO_CAR_HTML = mark_safe('<span style="color: #dc3545;">❌ No Car Assigned</span>')
+_NO_ACCIDENT_HTML = mark_safe('<span style="color: #28a745;">✅ No accidents reported</span>')
+_NO_SWAP_HTML = mark_safe('<span style="color: #28a745;">✅ No car swaps</span>')
+_PAYMENT_SUCCESS_HTML = mark_safe(
+    '<span style="background-color: #28a745; color: white; padding: 3px 8px; border-radius: 12px; font-size: 11px;">✅ SUCCESS</span>'
+)
+_PAYMENT_FAILED_HTML = mark_safe(
+    '<span style="background-color: #dc3545; color: white; padding: 3px 8px; border-radius: 12px; font-size: 11px;">❌ FAILED</span>'
+)
 
 
 @admin.register(Booking)
@@ -44,9 +176,14 @@ class BookingAdmin(admin.ModelAdmin):
     search_fields = ('booking_id', 'customer__name',
                      'car__car_name', 'customer__email')
     readonly_fields = ('booking_id', 'created_at', 'updated_at', 'created_by', 'booking_summary',
-                       'financial_summary', 'accident_summary', 'swap_summary', 'calculated_paid_amount', 'balance_due')
+                       'financial_summary', 'accident_summary', 'swap_summary', 'calculated_paid_amount', 'balance_due',
+                       'payments_link', 'extensions_link')
     list_editable = ('booking_status', 'payment_status', 'car_returned')
     list_per_page = 25
+    list_select_related = ('customer', 'car')
+    paginator = FasterAdminPaginator
+    show_full_result_count = False
+    autocomplete_fields = ('customer', 'car', 'original_car')
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
 
@@ -76,6 +213,9 @@ class BookingAdmin(admin.ModelAdmin):
             'fields': ('swap_summary', 'swap_date', 'swap_reason'),
             'classes': ('collapse',)
         }),
+        ('Related Records', {
+            'fields': ('payments_link', 'extensions_link'),
+        }),
         ('Booking Summary', {
             'fields': ('booking_summary',),
             'classes': ('collapse',)
@@ -86,140 +226,101 @@ class BookingAdmin(admin.ModelAdmin):
         }),
     )
 
-    inlines = [PaymentInline, BookingExtensionInline]
     actions = ['mark_returned', 'mark_cancelled', 'mark_active', 'send_reminder', 'bulk_payment_update',
                'check_overdue_bookings', 'generate_booking_report']
 
     def get_queryset(self, request):
-        """Optimize queries with select_related and prefetch_related"""
-        return super().get_queryset(request).select_related(
-            'customer', 'car', 'original_car', 'created_by'
-        ).prefetch_related('payments', 'extensions')
+        """Join customer and car for __str__; the remaining keys, counts and paid total on the change form only"""
+        qs = super().get_queryset(request).select_related('customer', 'car')
+        match = request.resolver_match
+        url_name = match.url_name if match and match.url_name else ''
+        if url_name.endswith('_changelist'):
+            # Only the columns read by list_display, list_editable and __str__;
+            # updated_at is kept so list_editable saves still stamp it
+            qs = qs.only(
+                'booking_id', 'customer', 'customer__name', 'customer__email',
+                'car', 'car__car_name', 'car__fee', 'start_date', 'end_date',
+                'booking_status', 'payment_status', 'car_returned', 'has_been_swapped',
+                'total_amount', 'paid_amount', 'extension_charges', 'accident_charges',
+                'created_at', 'updated_at',
+            )
+            # Schedule flags for date_range and days_count, and the balance
+            # from get_total_balance(), evaluated against one "today" for the page
+            today = timezone.now().date()
+            qs = qs.annotate(
+                _extra_charges=F('extension_charges') + F('accident_charges'),
+                _started=ExpressionWrapper(Q(start_date__lte=today), output_field=BooleanField()),
+            ).with_balance(today)
+        elif url_name.endswith('_change'):
+            qs = qs.select_related('original_car', 'created_by').annotate(
+                payment_count=Count('payments', distinct=True),
+                extension_count=Count('extensions', distinct=True),
+            ).with_total_paid()
+        return qs
 
     def booking_id_link(self, obj):
         """Display booking ID as a styled link"""
-        return format_html(
-            '<div>'
-            '<strong style="color: #007cba;">{}</strong><br>'
-            '<small style="color: #666;">Created: {}</small>'
-            '</div>',
-            obj.booking_id,
-            obj.created_at.strftime('%d %b %Y')
-        )
+        return format_html(_BOOKING_ID_TPL, obj.booking_id, obj.created_at.strftime('%d %b %Y'))
     booking_id_link.short_description = "Booking ID"
     booking_id_link.admin_order_field = 'booking_id'
 
     def customer_link(self, obj):
         """Display customer with link to customer admin"""
         if obj.customer:
-            url = reverse('admin:customers_customer_change',
-                          args=[obj.customer.id])
-            return format_html(
-                '<div>'
-                '<a href="{}" style="color: #007cba; font-weight: bold;">{}</a><br>'
-                '<small style="color: #666;">{}</small>'
-                '</div>',
-                url, obj.customer.name, obj.customer.email
-            )
-        return format_html('<span style="color: #dc3545;">❌ No Customer</span>')
+            url = _change_url('admin:customers_customer_change', obj.customer.id)
+            return format_html(_LINK_WITH_SUBTITLE_TPL, url, obj.customer.name, obj.customer.email)
+        return _NO_CUSTOMER_HTML
     customer_link.short_description = "Customer"
     customer_link.admin_order_field = 'customer__name'
 
     def car_link(self, obj):
         """Display car with link to car admin - FIXED None check"""
         if obj.car:
-            url = reverse('admin:cars_car_change', args=[obj.car.id])
+            url = _change_url('admin:cars_car_change', obj.car.id)
             swap_indicator = " 🔄" if obj.has_been_swapped else ""
-            return format_html(
-                '<div>'
-                '<a href="{}" style="color: #007cba; font-weight: bold;">{}{}</a><br>'
-                '<small style="color: #666;">₹{}/day</small>'
-                '</div>',
-                url, obj.car.car_name, swap_indicator, int(obj.car.fee)
-            )
-        return format_html('<span style="color: #dc3545;">❌ No Car Assigned</span>')
+            return format_html(_CAR_LINK_TPL, url, obj.car.car_name, swap_indicator, int(obj.car.fee))
+        return _NO_CAR_HTML
     car_link.short_description = "Car"
     car_link.admin_order_field = 'car__car_name'
 
     def date_range(self, obj):
         """Display booking date range with duration"""
-        today = timezone.now().date()
         duration = obj.get_duration_days()
 
-        # Determine status colors
-        start_color = '#28a745' if obj.start_date <= today else '#007bff'
-        end_color = '#dc3545' if obj.end_date < today and not obj.car_returned else '#28a745'
+        # Determine status colors from the flags annotated by get_queryset
+        start_color = '#28a745' if obj._started else '#007bff'
+        end_color = '#dc3545' if obj._overdue_days is not None else '#28a745'
 
-        return format_html(
-            '<div style="text-align: center;">'
-            '<span style="color: {}; font-weight: bold;">{}</span><br>'
-            '<small style="color: #666;">to</small><br>'
-            '<span style="color: {}; font-weight: bold;">{}</span><br>'
-            '<small style="color: #666;">({} days)</small>'
-            '</div>',
+        return mark_safe(_DATE_RANGE_TPL % (
             start_color, obj.start_date.strftime('%d %b'),
             end_color, obj.end_date.strftime('%d %b'),
             duration
-        )
+        ))
     date_range.short_description = "Date Range"
     date_range.admin_order_field = 'start_date'
 
     def total_amount_formatted(self, obj):
-        """Display total amount with breakdown"""
-        extra_charges = float(obj.extension_charges or 0) + \
-            float(obj.accident_charges or 0)
-        return format_html(
-            '<div style="text-align: right;">'
-            '<strong style="font-size: 14px;">₹{}</strong><br>'
-            '<small style="color: #666;">+ ₹{} charges</small>'
-            '</div>',
-            f"{float(obj.total_amount):,.2f}",
-            f"{extra_charges:,.0f}"
-        )
+        """Display total amount with breakdown; extra charges are summed by the changelist query"""
+        return mark_safe(_TOTAL_AMOUNT_TPL % (f"{obj.total_amount:,.2f}", f"{obj._extra_charges:,.0f}"))
     total_amount_formatted.short_description = "Total Amount"
     total_amount_formatted.admin_order_field = 'total_amount'
 
     def balance_due_formatted(self, obj):
         """Display remaining balance with overdue fees"""
-        try:
-            balance = obj.get_total_balance()
-        except:
-            balance = float(obj.total_amount or 0) - \
-                float(obj.paid_amount or 0)
+        balance = obj.get_total_balance()
 
-        color = '#dc3545' if balance > 0 else '#28a745'
-
-        return format_html(
-            '<div style="text-align: right; color: {};">'
-            '<strong style="font-size: 14px;">₹{}</strong><br>'
-            '<small>{}</small>'
-            '</div>',
-            color, f"{balance:,.2f}",
-            'Due' if balance > 0 else 'Paid'
-        )
+        template = _BALANCE_DUE_TPL if balance > 0 else _BALANCE_PAID_TPL
+        return mark_safe(template % f"{balance:,.2f}")
     balance_due_formatted.short_description = "Balance"
 
     def days_count(self, obj):
         """Display duration with overdue indicator"""
         duration = obj.get_duration_days()
-        today = timezone.now().date()
 
-        if obj.end_date < today and not obj.car_returned:
-            overdue_days = (today - obj.end_date).days
-            return format_html(
-                '<div style="text-align: center;">'
-                '<strong>{}</strong> days<br>'
-                '<small style="color: #dc3545;">⚠️ {} days overdue</small>'
-                '</div>',
-                duration, overdue_days
-            )
+        if obj._overdue_days is not None:
+            return mark_safe(_DAYS_OVERDUE_TPL % (duration, obj._overdue_days))
 
-        return format_html(
-            '<div style="text-align: center;">'
-            '<strong>{}</strong> days'
-            '</div>',
-            duration
-        )
+        return mark_safe(_DAYS_TPL % duration)
     days_count.short_description = "Duration"
 
     def booking_summary(self, obj):
@@ -228,18 +329,7 @@ class BookingAdmin(admin.ModelAdmin):
         daily_rate = float(obj.car.fee) if obj.car else 0
 
         return format_html(
-            '<div style="line-height: 1.6; padding: 15px; background: #f8f9fa; border-radius: 8px;">'
-            '<h4 style="margin-top: 0; color: #495057;">📋 Booking Overview</h4>'
-            '<div style="display: grid; grid-template-columns: 1fr 1fr; gap: 10px;">'
-            '<div><strong>Duration:</strong> {} days</div>'
-            '<div><strong>Daily Rate:</strong> ₹{}</div>'
-            '<div><strong>Car Returned:</strong> {}</div>'
-            '<div><strong>Has Accident:</strong> {}</div>'
-            '<div><strong>Car Swapped:</strong> {}</div>'
-            '<div><strong>Pickup Time:</strong> {}</div>'
-            '<div><strong>Dropoff Time:</strong> {}</div>'
-            '<div><strong>Actual Return:</strong> {}</div>'
-            '</div></div>',
+            _BOOKING_SUMMARY_TPL,
             duration, f"{daily_rate:,.2f}",
             "✅ Yes" if obj.car_returned else "❌ No",
             "⚠️ Yes" if obj.has_accident else "✅ No",
@@ -252,28 +342,11 @@ class BookingAdmin(admin.ModelAdmin):
 
     def financial_summary(self, obj):
         """Detailed financial breakdown"""
-        try:
-            balance = obj.get_total_balance()
-            total_paid_calculated = obj.get_total_paid()
-        except:
-            balance = float(obj.total_amount or 0) - \
-                float(obj.paid_amount or 0)
-            total_paid_calculated = float(obj.paid_amount or 0)
+        balance = obj.get_total_balance()
+        total_paid_calculated = obj.get_total_paid()
 
         return format_html(
-            '<div style="line-height: 1.6; padding: 15px; background: #f8f9fa; border-radius: 8px;">'
-            '<h4 style="margin-top: 0; color: #495057;">💰 Financial Breakdown</h4>'
-            '<table style="width: 100%; border-collapse: collapse;">'
-            '<tr><td><strong>Subtotal:</strong></td><td style="text-align: right;">₹{}</td></tr>'
-            '<tr><td><strong>Tax:</strong></td><td style="text-align: right;">₹{}</td></tr>'
-            '<tr><td><strong>Discount:</strong></td><td style="text-align: right; color: green;">-₹{}</td></tr>'
-            '<tr><td><strong>Extension Charges:</strong></td><td style="text-align: right;">₹{}</td></tr>'
-            '<tr><td><strong>Accident Charges:</strong></td><td style="text-align: right;">₹{}</td></tr>'
-            '<tr style="border-top: 2px solid #dee2e6;"><td><strong>Total Amount:</strong></td><td style="text-align: right;"><strong>₹{}</strong></td></tr>'
-            '<tr><td><strong>Paid Amount (DB):</strong></td><td style="text-align: right; color: green;">₹{}</td></tr>'
-            '<tr><td><strong>Calculated Paid:</strong></td><td style="text-align: right; color: blue;">₹{}</td></tr>'
-            '<tr style="border-top: 1px solid #dee2e6;"><td><strong>Balance Due:</strong></td><td style="text-align: right; color: {};">₹{}</td></tr>'
-            '</table></div>',
+            _FINANCIAL_SUMMARY_TPL,
             f"{float(obj.subtotal or 0):,.2f}",
             f"{float(obj.tax or 0):,.2f}",
             f"{float(obj.discount or 0):,.2f}",
@@ -290,16 +363,10 @@ class BookingAdmin(admin.ModelAdmin):
     def accident_summary(self, obj):
         """Accident information summary"""
         if not obj.has_accident:
-            return format_html('<span style="color: #28a745;">✅ No accidents reported</span>')
+            return _NO_ACCIDENT_HTML
 
         return format_html(
-            '<div style="line-height: 1.6; padding: 15px; background: #fff3cd; border-radius: 8px; border-left: 4px solid #ffc107;">'
-            '<h4 style="margin-top: 0; color: #856404;">⚠️ Accident Report</h4>'
-            '<p><strong>Date:</strong> {}</p>'
-            '<p><strong>Charges:</strong> ₹{}</p>'
-            '<p><strong>Description:</strong></p>'
-            '<p style="background: white; padding: 10px; border-radius: 4px;">{}</p>'
-            '</div>',
+            _ACCIDENT_SUMMARY_TPL,
             obj.accident_date or "Not specified",
             f"{float(obj.accident_charges or 0):,.2f}",
             obj.accident_description or "No description provided"
@@ -309,16 +376,10 @@ class BookingAdmin(admin.ModelAdmin):
     def swap_summary(self, obj):
         """Car swap information summary - FIXED None checks"""
         if not obj.has_been_swapped:
-            return format_html('<span style="color: #28a745;">✅ No car swaps</span>')
+            return _NO_SWAP_HTML
 
         return format_html(
-            '<div style="line-height: 1.6; padding: 15px; background: #d1ecf1; border-radius: 8px; border-left: 4px solid #17a2b8;">'
-            '<h4 style="margin-top: 0; color: #0c5460;">🔄 Car Swap Details</h4>'
-            '<p><strong>Original Car:</strong> {}</p>'
-            '<p><strong>Current Car:</strong> {}</p>'
-            '<p><strong>Swap Date:</strong> {}</p>'
-            '<p><strong>Reason:</strong> {}</p>'
-            '</div>',
+            _SWAP_SUMMARY_TPL,
             obj.original_car.car_name if obj.original_car else "Not recorded",
             obj.car.car_name if obj.car else "Not assigned",
             obj.swap_date or "Not specified",
@@ -326,24 +387,67 @@ class BookingAdmin(admin.ModelAdmin):
         )
     swap_summary.short_description = "Car Swap Information"
 
+    def payments_link(self, obj):
+        """Payment count with links to the booking's payments"""
+        if not obj.pk:
+            return "-"
+        count = getattr(obj, 'payment_count', None)
+        if count is None:
+            count = obj.payments.count()
+        return format_html(
+            '<a href="{}?booking__exact={}" style="color: #007cba; font-weight: bold;">💳 {} payment(s)</a>'
+            ' &nbsp; <a href="{}?booking={}">+ Add payment</a>',
+            reverse('admin:bookings_payment_changelist'), obj.pk, count,
+            reverse('admin:bookings_payment_add'), obj.pk
+        )
+    payments_link.short_description = "Payments"
+
+    def extensions_link(self, obj):
+        """Extension count with links to the booking's extensions"""
+        if not obj.pk:
+            return "-"
+        count = getattr(obj, 'extension_count', None)
+        if count is None:
+            count = obj.extensions.count()
+        return format_html(
+            '<a href="{}?booking__exact={}" style="color: #007cba; font-weight: bold;">📅 {} extension(s)</a>'
+            ' &nbsp; <a href="{}?booking={}">+ Add extension</a>',
+            reverse('admin:bookings_bookingextension_changelist'), obj.pk, count,
+            reverse('admin:bookings_bookingextension_add'), obj.pk
+        )
+    extensions_link.short_description = "Extensions"
+
     # Custom Actions
+    def _lock_bookings(self, queryset):
+        """Lock the bookings until the surrounding transaction ends; return their ids and car ids"""
+        rows = list(queryset.select_for_update(of=('self',)).values_list('id', 'car_id'))
+        return [pk for pk, _ in rows], {car_id for _, car_id in rows if car_id is not None}
+
+    def _send_post_save(self, ids, update_fields):
+        """Once the transaction commits, send post_save for each updated booking as save() would"""
+        def send():
+            for booking in Booking.objects.select_related('customer', 'car').filter(id__in=ids):
+                post_save.send(
+                    sender=Booking, instance=booking, created=False, raw=False,
+                    using=booking._state.db, update_fields=frozenset(update_fields),
+                )
+        transaction.on_commit(send)
+
     def mark_returned(self, request, queryset):
         """Mark selected bookings as returned"""
-        updated = 0
-        for booking in queryset:
-            if not booking.car_returned:
-                booking.car_returned = True
-                booking.booking_status = 'Returned'
-                booking.actual_return_date = timezone.now().date()
-
-                # Update car availability - FIXED None check
-                if booking.car:
-                    booking.car.availability = 'Available'
-                    booking.car.status = 'Active'
-                    booking.car.save()
-
-                booking.save()
-                updated += 1
+        with transaction.atomic():
+            ids, car_ids = self._lock_bookings(queryset.filter(car_returned=False))
+            now = timezone.now()
+            updated = Booking.objects.filter(id__in=ids).update(
+                car_returned=True,
+                booking_status='Returned',
+                actual_return_date=now.date(),
+                updated_at=now,
+            )
+            Car.objects.filter(id__in=car_ids).update(
+                availability='Available', status='Active', updated_at=now)
+            self._send_post_save(
+                ids, ['car_returned', 'booking_status', 'actual_return_date', 'updated_at'])
 
         self.message_user(
             request, f'✅ {updated} bookings marked as returned.', messages.SUCCESS)
@@ -351,43 +455,65 @@ class BookingAdmin(admin.ModelAdmin):
 
     def mark_cancelled(self, request, queryset):
         """Cancel selected bookings"""
-        updated = 0
-        for booking in queryset:
-            if booking.booking_status not in ['Returned', 'Cancelled']:
-                booking.booking_status = 'Cancelled'
-
-                # Update car availability - FIXED None check
-                if booking.car:
-                    booking.car.availability = 'Available'
-                    booking.car.status = 'Active'
-                    booking.car.save()
-
-                booking.save()
-                updated += 1
+        with transaction.atomic():
+            ids, car_ids = self._lock_bookings(
+                queryset.exclude(booking_status__in=['Returned', 'Cancelled'])
+            )
+            now = timezone.now()
+            updated = Booking.objects.filter(id__in=ids).update(
+                booking_status='Cancelled', updated_at=now)
+            Car.objects.filter(id__in=car_ids).update(
+                availability='Available', status='Active', updated_at=now)
+            self._send_post_save(ids, ['booking_status', 'updated_at'])
 
         self.message_user(
             request, f'❌ {updated} bookings cancelled.', messages.WARNING)
     mark_cancelled.short_description = "❌ Cancel selected bookings"
 
     def mark_active(self, request, queryset):
-        """Mark selected bookings as active"""
-        updated = 0
-        for booking in queryset:
-            if booking.booking_status != 'Active':
-                booking.booking_status = 'Active'
-                booking.car_returned = False
-
-                # Update car availability - FIXED None check
-                if booking.car:
-                    booking.car.availability = 'Booked'
-                    booking.car.status = 'Booked'
-                    booking.car.save()
-
-                booking.save()
-                updated += 1
+        """
+        Mark selected bookings as active, skipping any that would double-book their car.
+        Where selected bookings overlap each other, the earliest by start date is kept.
+        """
+        with transaction.atomic():
+            candidate_ids, _ = self._lock_bookings(queryset.exclude(booking_status='Active'))
+
+            # Same overlap rule as Booking.check_car_availability, checked
+            # against live bookings outside the selection
+            overlapping = Booking.objects.filter(
+                car=OuterRef('car'),
+                start_date__lt=OuterRef('end_date'),
+                end_date__gt=OuterRef('start_date'),
+            ).exclude(booking_status__in=['Cancelled', 'Returned']).exclude(id__in=candidate_ids)
+            candidates = Booking.objects.filter(id__in=candidate_ids).exclude(
+                Exists(overlapping)
+            ).order_by('start_date', 'id').values_list('id', 'car_id', 'start_date', 'end_date')
+
+            # Then against the bookings of the selection already kept
+            ids, car_ids, kept = [], set(), {}
+            for pk, car_id, start_date, end_date in candidates:
+                if car_id is not None:
+                    periods = kept.setdefault(car_id, [])
+                    if any(start_date < end and end_date > start for start, end in periods):
+                        continue
+                    periods.append((start_date, end_date))
+                    car_ids.add(car_id)
+                ids.append(pk)
+
+            now = timezone.now()
+            updated = Booking.objects.filter(id__in=ids).update(
+                booking_status='Active', car_returned=False, updated_at=now)
+            Car.objects.filter(id__in=car_ids).update(
+                availability='Booked', status='Booked', updated_at=now)
+            self._send_post_save(ids, ['booking_status', 'car_returned', 'updated_at'])
 
         self.message_user(
             request, f'🔄 {updated} bookings marked as active.', messages.INFO)
+        skipped = len(candidate_ids) - updated
+        if skipped:
+            self.message_user(
+                request, f'⚠️ {skipped} bookings skipped: their car is already booked for those dates.',
+                messages.WARNING)
     mark_active.short_description = "🔄 Mark as active"
 
     def send_reminder(self, request, queryset):
@@ -407,13 +533,15 @@ class BookingAdmin(admin.ModelAdmin):
     def check_overdue_bookings(self, request, queryset):
         """Check for overdue bookings"""
         today = timezone.now().date()
-        overdue_count = queryset.filter(
+        overdue = queryset.filter(
             end_date__lt=today,
             car_returned=False,
             booking_status__in=['Active', 'Overdue']
-        ).count()
+        )
 
-        if overdue_count > 0:
+        # Probe with EXISTS first; the exact count is only needed for the warning
+        if overdue.exists():
+            overdue_count = overdue.count()
             self.message_user(
                 request, f'⚠️ Found {overdue_count} overdue bookings in selection.', messages.WARNING)
         else:
@@ -423,9 +551,12 @@ class BookingAdmin(admin.ModelAdmin):
 
     def generate_booking_report(self, request, queryset):
         """Generate booking report"""
-        count = queryset.count()
+        # The CSV is streamed by a background worker and emailed to the requester
+        ids = list(queryset.values_list('pk', flat=True))
+        export_bookings_csv.delay(ids, request.user.pk)
         self.message_user(
-            request, f'📊 Report generation ready for {count} bookings.', messages.INFO)
+            request, f'📊 Report of {len(ids)} bookings queued, a download link will be emailed to you.',
+            messages.INFO)
     generate_booking_report.short_description = "📊 Generate booking report"
 
     def save_model(self, request, obj, form, change):
@@ -444,6 +575,10 @@ class PaymentAdmin(admin.ModelAdmin):
     search_fields = ('booking__booking_id', 'transaction_id',
                      'booking__customer__name')
     readonly_fields = ('created_at', 'created_by')
+    autocomplete_fields = ('booking',)
+    list_select_related = ('booking', 'booking__customer')
+    paginator = FasterAdminPaginator
+    show_full_result_count = False
     date_hierarchy = 'payment_date'
     ordering = ['-payment_date']
 
@@ -460,41 +595,43 @@ class PaymentAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        """Load the booking and its customer with each payment; list columns only on the changelist.
+        The change form also joins the booking's car, read by Booking.__str__ and the balance."""
+        qs = super().get_queryset(request)
+        match = request.resolver_match
+        url_name = match.url_name if match and match.url_name else ''
+        if url_name.endswith('_changelist'):
+            return qs.select_related('booking', 'booking__customer').only(
+                'booking', 'booking__booking_id', 'booking__customer', 'booking__customer__name',
+                'amount', 'payment_method', 'payment_date', 'is_successful',
+                'transaction_id', 'created_at',
+            )
+        return qs.select_related('booking', 'booking__customer', 'booking__car', 'created_by')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """Join the customer and car read by the selected booking's label"""
+        if db_field.name == 'booking':
+            kwargs['queryset'] = Booking.objects.select_related('customer', 'car')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
     def booking_link(self, obj):
         """Link to the booking"""
-        url = reverse('admin:bookings_booking_change', args=[obj.booking.id])
-        return format_html(
-            '<div>'
-            '<a href="{}" style="color: #007cba; font-weight: bold;">{}</a><br>'
-            '<small style="color: #666;">{}</small>'
-            '</div>',
-            url, obj.booking.booking_id, obj.booking.customer.name
-        )
+        url = _change_url('admin:bookings_booking_change', obj.booking.id)
+        return format_html(_LINK_WITH_SUBTITLE_TPL, url, obj.booking.booking_id, obj.booking.customer.name)
     booking_link.short_description = "Booking"
     booking_link.admin_order_field = 'booking__booking_id'
 
     def amount_formatted(self, obj):
         """Display amount with success status color"""
-        color = '#28a745' if obj.is_successful else '#dc3545'
-        return format_html(
-            '<div style="text-align: right;">'
-            '<strong style="color: {}; font-size: 14px;">₹{}</strong>'
-            '</div>',
-            color, f"{float(obj.amount):,.2f}"
-        )
+        template = _AMOUNT_SUCCESS_TPL if obj.is_successful else _AMOUNT_FAILED_TPL
+        return mark_safe(template % f"{obj.amount:,.2f}")
     amount_formatted.short_description = "Amount"
     amount_formatted.admin_order_field = 'amount'
 
     def success_status(self, obj):
         """Display success status badge"""
-        if obj.is_successful:
-            return format_html(
-                '<span style="background-color: #28a745; color: white; padding: 3px 8px; border-radius: 12px; font-size: 11px;">✅ SUCCESS</span>'
-            )
-        else:
-            return format_html(
-                '<span style="background-color: #dc3545; color: white; padding: 3px 8px; border-radius: 12px; font-size: 11px;">❌ FAILED</span>'
-            )
+        return _PAYMENT_SUCCESS_HTML if obj.is_successful else _PAYMENT_FAILED_HTML
     success_status.short_description = "Status"
     success_status.admin_order_field = 'is_successful'
 
@@ -513,6 +650,10 @@ class BookingExtensionAdmin(admin.ModelAdmin):
     search_fields = ('booking__booking_id', 'reason',
                      'booking__customer__name')
     readonly_fields = ('created_at', 'created_by')
+    autocomplete_fields = ('booking',)
+    list_select_related = ('booking', 'booking__customer')
+    paginator = FasterAdminPaginator
+    show_full_result_count = False
     date_hierarchy = 'created_at'
 
     fieldsets = (
@@ -525,29 +666,44 @@ class BookingExtensionAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        """Load the booking with each extension; list columns only on the changelist.
+        The change form also joins the booking's customer and car, read by Booking.__str__."""
+        qs = super().get_queryset(request)
+        match = request.resolver_match
+        url_name = match.url_name if match and match.url_name else ''
+        if url_name.endswith('_changelist'):
+            return qs.select_related('booking', 'booking__customer').only(
+                'booking', 'booking__booking_id', 'booking__customer', 'booking__customer__name',
+                'previous_end_date', 'new_end_date', 'extension_fee', 'reason', 'created_at',
+            )
+        return qs.select_related('booking', 'booking__customer', 'booking__car', 'created_by')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """Join the customer and car read by the selected booking's label"""
+        if db_field.name == 'booking':
+            kwargs['queryset'] = Booking.objects.select_related('customer', 'car')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
     def booking_link(self, obj):
         """Link to the booking"""
-        url = reverse('admin:bookings_booking_change', args=[obj.booking.id])
+        url = _change_url('admin:bookings_booking_change', obj.booking.id)
         return format_html('<a href="{}" style="color: #007cba;">{}</a>', url, obj.booking.booking_id)
     booking_link.short_description = "Booking"
 
     def date_extension(self, obj):
         """Display date extension details"""
         days_extended = (obj.new_end_date - obj.previous_end_date).days
-        return format_html(
-            '<div style="text-align: center;">'
-            '{} <br>→<br> {}<br>'
-            '<small style="color: #666;">(+{} days)</small>'
-            '</div>',
+        return mark_safe(_DATE_EXTENSION_TPL % (
             obj.previous_end_date.strftime('%d %b'),
             obj.new_end_date.strftime('%d %b'),
             days_extended
-        )
+        ))
     date_extension.short_description = "Extension"
 
     def extension_fee_formatted(self, obj):
         """Display formatted extension fee"""
-        return format_html('<strong>₹{}</strong>', f"{float(obj.extension_fee):,.2f}")
+        return mark_safe('<strong>₹%s</strong>' % f"{obj.extension_fee:,.2f}")
     extension_fee_formatted.short_description = "Fee"
     extension_fee_formatted.admin_order_field = 'extension_fee'
 
@@ -0,0 +1,136 @@
+from django.db import models, transaction
+from django.db.models import (
+    Case, DecimalField, ExpressionWrapper, F, Func, IntegerField, OuterRef, Subquery, Sum,
+    Value, When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+class DaysBetween(Func):
+    """
+    Whole days from the second date expression to the first.
+
+    PostgreSQL and MySQL return an integer for date arithmetic directly,
+    where Django's own subtraction would produce an interval.
+    """
+    arg_joiner = ' - '
+    template = '(%(expressions)s)'
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS integer)',
+            arg_joiner=') - julianday(',
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, function='DATEDIFF', arg_joiner=', ',
+            template='%(function)s(%(expressions)s)', **extra_context,
+        )
+
+
+def total_paid_expression():
+    """
+    Sum of the successful payments of the booking in the outer query, or 0.
+
+    A correlated subquery, so the sum is not multiplied by other joins on
+    the same queryset and it can be used in an UPDATE.
+    """
+    from .models import Payment
+
+    paid = (
+        Payment.objects.filter(booking=OuterRef('pk'), is_successful=True)
+        .order_by().values('booking').annotate(total=Sum('amount')).values('total')
+    )
+    return Coalesce(
+        Subquery(paid), Value(0),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+class BookingQuerySet(models.QuerySet):
+    def with_total_paid(self):
+        """
+        Annotate each booking with `_total_paid`, the sum of its successful payments.
+
+        Booking.get_total_paid() returns the annotation instead of running an
+        aggregate per booking.
+        """
+        return self.annotate(_total_paid=total_paid_expression())
+
+    def with_balance(self, today=None):
+        """
+        Annotate each booking with its overdue days, overdue fee and balance.
+
+        Adds `_overdue_days` (None unless the car is unreturned past its end
+        date), `_overdue_fee` and `_balance`, the figure returned by
+        Booking.get_total_balance(). The car's fee is read through a join,
+        so the car does not need to be loaded.
+
+        Args:
+            today (date, optional): Date to measure overdue days against.
+                Defaults to the current date.
+        """
+        today = today or timezone.now().date()
+        money = DecimalField(max_digits=10, decimal_places=2)
+        return self.annotate(
+            _overdue_days=Case(
+                When(
+                    end_date__lt=today, car_returned=False,
+                    then=DaysBetween(Value(today), F('end_date')),
+                ),
+                default=None,
+                output_field=IntegerField(),
+            ),
+            _overdue_fee=Coalesce(
+                F('car__fee') * F('_overdue_days'), Value(0), output_field=money,
+            ),
+            _balance=ExpressionWrapper(
+                F('total_amount') + F('_overdue_fee') + F('accident_charges') - F('paid_amount'),
+                output_field=money,
+            ),
+        )
+
+
+class PaymentQuerySet(models.QuerySet):
+    """
+    Payment queryset whose bulk delete() and update() keep booking totals right.
+
+    Payment.save() and delete() adjust the booking by the change in each
+    payment; the bulk paths skip those methods, so they recalculate every
+    affected booking from its payments instead.
+    """
+    # Columns that change what a payment contributes to its booking
+    TOTAL_FIELDS = frozenset({'booking', 'booking_id', 'amount', 'is_successful'})
+
+    def _booking_ids(self):
+        return set(self.order_by().values_list('booking_id', flat=True).distinct())
+
+    def delete(self):
+        booking_ids = self._booking_ids()
+        with transaction.atomic(using=self.db):
+            result = super().delete()
+            self.model.recalculate_bookings(booking_ids, self.db)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def update(self, **kwargs):
+        if self.TOTAL_FIELDS.isdisjoint(kwargs):
+            return super().update(**kwargs)
+        booking_ids = self._booking_ids()
+        with transaction.atomic(using=self.db):
+            rows = super().update(**kwargs)
+            for field in ('booking', 'booking_id'):
+                value = kwargs.get(field)
+                if value is not None and not hasattr(value, 'resolve_expression'):
+                    booking_ids.add(getattr(value, 'pk', value))
+            self.model.recalculate_bookings(booking_ids, self.db)
+        return rows
+
+    update.alters_data = True
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-16 00:10
+
+from django.db import migrations
+
+# Admin search uses icontains, which PostgreSQL runs as UPPER(col::text) LIKE UPPER(%term%);
+# trigram indexes on that expression let those searches avoid a sequential scan.
+INDEXES = [
+    ('booking_booking_id_trgm', 'booking_id'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON bookings_booking '
+            f'USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_remove_booking_overdue_fee'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
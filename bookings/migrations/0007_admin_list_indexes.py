@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-15 23:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_search_trigram_indexes'),
+        ('cars', '0005_search_trigram_indexes'),
+        ('customers', '0003_search_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['-created_at'], name='bookings_bo_created_7d6386_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('car_returned', False)), fields=['end_date'], name='booking_unreturned_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookingextension',
+            index=models.Index(fields=['-created_at'], name='bookings_bo_created_fe1f7a_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-15 23:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_admin_list_indexes'),
+        ('cars', '0005_search_trigram_indexes'),
+        ('customers', '0003_search_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('booking_status__in', ['Cancelled', 'Returned']), _negated=True), fields=['car', 'start_date', 'end_date'], name='booking_car_schedule_idx'),
+        ),
+    ]
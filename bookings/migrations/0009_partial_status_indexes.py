@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-15 23:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_booking_car_schedule_index'),
+        ('cars', '0005_search_trigram_indexes'),
+        ('customers', '0003_search_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='booking_status',
+            field=models.CharField(choices=[('Active', 'Active'), ('Returned', 'Returned'), ('Cancelled', 'Cancelled'), ('Overdue', 'Overdue')], default='Active', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='payment_status',
+            field=models.CharField(choices=[('Paid', 'Paid'), ('Partial', 'Partial'), ('Unpaid', 'Unpaid')], default='Unpaid', max_length=20),
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='bookings_bo_booking_9deb2e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='bookings_bo_payment_27706e_idx',
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('booking_status__in', ['Active', 'Overdue'])), fields=['booking_status'], name='booking_live_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('payment_status', 'Paid'), _negated=True), fields=['payment_status'], name='booking_unpaid_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-15 23:52
+
+from django.db import migrations
+
+# Two bookings holding the same car may not share a day. Booking.clean() checks
+# this before saving; the exclusion constraint also covers two requests that
+# pass that check at the same time. The range is half-open like the check, so
+# a booking may start on the day another ends.
+CONSTRAINT = 'booking_no_double_book'
+
+
+def create_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        f'ALTER TABLE bookings_booking ADD CONSTRAINT {CONSTRAINT} '
+        f"EXCLUDE USING gist (car_id WITH =, daterange(start_date, end_date, '[)') WITH &&) "
+        f"WHERE (booking_status NOT IN ('Cancelled', 'Returned'))"
+    )
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'ALTER TABLE bookings_booking DROP CONSTRAINT IF EXISTS {CONSTRAINT}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_partial_status_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_exclusion_constraint, drop_exclusion_constraint),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-15 23:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0010_booking_no_double_book'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('is_successful', True)), fields=['booking'], include=('amount',), name='payment_booking_success_idx'),
+        ),
+    ]
@@ -1,8 +1,39 @@
-from django.db import models
+from contextlib import contextmanager
+
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import Exact, LessThan
+from django.db.models.signals import post_save
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.conf import settings
-import uuid
+import secrets
+
+from .managers import BookingQuerySet, PaymentQuerySet, total_paid_expression
+
+DOUBLE_BOOKING_MESSAGE = 'This car is already booked for the selected dates'
+
+
+@contextmanager
+def reject_double_booking(using=None):
+    """
+    Run a booking write, reporting an overlap like Booking.clean() does.
+
+    On PostgreSQL the booking_no_double_book constraint rejects an overlap
+    that slipped past clean() in a concurrent request. The write runs in a
+    savepoint so a surrounding transaction stays usable afterwards.
+
+    Raises:
+        ValidationError: If the constraint rejected the write.
+    """
+    try:
+        with transaction.atomic(using=using):
+            yield
+    except IntegrityError as exc:
+        if 'booking_no_double_book' not in str(exc):
+            raise
+        raise ValidationError(DOUBLE_BOOKING_MESSAGE) from exc
+
 
 class Booking(models.Model):
     """
@@ -73,13 +104,14 @@ class Booking(models.Model):
                                         help_text="The date when car was actually returned")
     
     # Status information
+    # Only live and unpaid rows are indexed; see Meta.indexes
     booking_status = models.CharField(max_length=20, choices=BOOKING_STATUS_CHOICES, 
-                                    default='Active', db_index=True)
+                                    default='Active')
     car_returned = models.BooleanField(default=False)
     
     # Payment details
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, 
-                                    default='Unpaid', db_index=True)
+                                    default='Unpaid')
     subtotal = models.DecimalField(max_digits=10, decimal_places=2, 
                                  help_text="Base fee * number of days")
     tax = models.DecimalField(max_digits=10, decimal_places=2, default=0)
@@ -110,6 +142,11 @@ class Booking(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, 
                                  null=True, related_name='bookings_created')
+
+    objects = BookingQuerySet.as_manager()
+
+    # Fields whose change requires the car availability check in clean()
+    SCHEDULE_FIELDS = frozenset({'car', 'car_id', 'start_date', 'end_date'})
     
     @classmethod
     def check_car_availability(cls, car, start_date, end_date, exclude_booking_id=None):
@@ -117,7 +154,7 @@ class Booking(models.Model):
         Check if a car is available for the given date range.
         
         Args:
-            car (Car): The car to check availability for
+            car (Car | int): The car, or its primary key, to check availability for
             start_date (date): Start date of the booking
             end_date (date): End date of the booking
             exclude_booking_id (int, optional): Booking ID to exclude from check (for updates)
@@ -149,32 +186,41 @@ class Booking(models.Model):
         if self.start_date and self.end_date and self.start_date > self.end_date:
             raise ValidationError('Start date must be before end date')
             
-        # Check car availability using the new method
-        if self.car:
+        # Check car availability using the new method; on PostgreSQL the
+        # booking_no_double_book constraint also rejects concurrent overlaps.
+        # car_id avoids loading the car row just to test for one
+        if self.car_id:
             is_available = self.check_car_availability(
-                car=self.car,
+                car=self.car_id,
                 start_date=self.start_date,
                 end_date=self.end_date,
                 exclude_booking_id=self.id  # Exclude current booking for updates
             )
             
             if not is_available:
-                raise ValidationError('This car is already booked for the selected dates')
+                raise ValidationError(DOUBLE_BOOKING_MESSAGE)
             
     def save(self, *args, **kwargs):
         """
         Save the booking instance.
 
         - Generates a unique booking ID if not set.
-        - Validates booking before saving.
+        - Validates booking before saving, unless update_fields leaves the
+          car and dates untouched.
         """
-        # Generate booking ID on creation
+        # Generate booking ID on creation; 48 random bits keep same-day
+        # collisions on the unique column out of reach
         if not self.booking_id:
-            unique_id = str(uuid.uuid4()).split('-')[0]
+            unique_id = secrets.token_hex(6)
             self.booking_id = f"BK-{timezone.now().strftime('%Y%m%d')}-{unique_id}"
         
-        self.clean()
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or not self.SCHEDULE_FIELDS.isdisjoint(update_fields):
+            self.clean()
+            with reject_double_booking(kwargs.get('using')):
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
 
         
     def extend(self, new_end_date, extension_fee=0, reason=None, remarks=None, user=None):
@@ -182,6 +228,8 @@ class Booking(models.Model):
         Extend this booking to a new end date.
 
         Creates a BookingExtension record and updates booking's end_date and charges.
+        Both are written in one transaction; the charges are incremented in
+        SQL so concurrent extensions cannot overwrite each other.
 
         Args:
             new_end_date (date): The new end date.
@@ -189,32 +237,62 @@ class Booking(models.Model):
             reason (str, optional): Reason for extension.
             remarks (str, optional): Additional remarks.
             user (User, optional): User performing the extension.
+
+        Raises:
+            ValidationError: If the new end date is not later, or the car is
+                booked by someone else in the extended period.
         """
         if new_end_date <= self.end_date:
             raise ValidationError("New end date must be after current end date.")
 
-        BookingExtension.objects.create(
-            booking=self,
-            previous_end_date=self.end_date,
-            new_end_date=new_end_date,
-            extension_fee=extension_fee,
-            reason=reason,
-            remarks=remarks,
-            created_by=user
-        )
-        self.extension_charges += extension_fee
+        # The extended period must still be free for this car
+        previous_end_date = self.end_date
         self.end_date = new_end_date
+        try:
+            self.clean()
+            with reject_double_booking():
+                BookingExtension.objects.create(
+                    booking=self,
+                    previous_end_date=previous_end_date,
+                    new_end_date=new_end_date,
+                    extension_fee=extension_fee,
+                    reason=reason,
+                    remarks=remarks,
+                    created_by=user
+                )
+                Booking.objects.filter(pk=self.pk).update(
+                    extension_charges=models.F('extension_charges') + extension_fee,
+                    end_date=new_end_date,
+                    total_amount=models.F('total_amount') + extension_fee,
+                )
+        except ValidationError:
+            self.end_date = previous_end_date
+            raise
+        self.extension_charges += extension_fee
         self.total_amount += extension_fee
-        self.save(update_fields=['extension_charges', 'end_date', 'total_amount'])
+
+        # Booking.save() is not called, so notify its receivers directly
+        post_save.send(
+            sender=Booking, instance=self, created=False, raw=False, using=self._state.db,
+            update_fields=frozenset(['extension_charges', 'end_date', 'total_amount']),
+        )
             
     def swap_car(self, new_car, reason):
         """
         Swap the car assigned to this booking.
 
+        The booking row and both cars are written in one transaction, each
+        with a single UPDATE of the changed columns.
+
         Args:
             new_car (Car): The replacement car.
             reason (str): Reason for swapping.
+
+        Raises:
+            ValidationError: If the new car is already booked for these dates.
         """
+        from cars.models import Car
+
         if self.has_been_swapped:
             old_car = self.original_car
         else:
@@ -225,16 +303,40 @@ class Booking(models.Model):
         self.has_been_swapped = True
         self.swap_date = timezone.now().date()
         self.swap_reason = reason
-        self.save()
-        
-        # Update car statuses
-        old_car.availability = 'Available'
-        old_car.status = 'Active'
-        old_car.save()
-        
+        self.updated_at = timezone.now()
+        self.clean()
+
+        swap_fields = ['car', 'original_car', 'has_been_swapped', 'swap_date', 'swap_reason', 'updated_at']
+        car_ids = [car.pk for car in (old_car, new_car) if car is not None]
+        with reject_double_booking():
+            Booking.objects.filter(pk=self.pk).update(
+                **{field: getattr(self, field) for field in swap_fields}
+            )
+            # Update car statuses
+            Car.objects.filter(pk__in=car_ids).update(
+                availability=models.Case(
+                    models.When(pk=new_car.pk, then=models.Value('Booked')),
+                    default=models.Value('Available'),
+                ),
+                status=models.Case(
+                    models.When(pk=new_car.pk, then=models.Value('Booked')),
+                    default=models.Value('Active'),
+                ),
+                updated_at=self.updated_at,
+            )
+
+        # Keep the loaded cars in step with their rows
+        if old_car is not None:
+            old_car.availability = 'Available'
+            old_car.status = 'Active'
         new_car.availability = 'Booked'
         new_car.status = 'Booked'
-        new_car.save()
+
+        # Booking.save() is not called, so notify its receivers directly
+        post_save.send(
+            sender=Booking, instance=self, created=False, raw=False,
+            using=self._state.db, update_fields=frozenset(swap_fields),
+        )
     
     def get_duration_days(self):
         """
@@ -245,34 +347,57 @@ class Booking(models.Model):
         """
         return (self.end_date - self.start_date).days
     
+    def get_total_due(self):
+        """
+        Calculate the amount owed for the booking before any payment.
+        Includes overdue fees if applicable.
+
+        Uses the `_overdue_fee` annotation when the queryset provided one.
+
+        Returns:
+            Decimal: total_amount + overdue_fee + accident_charges
+        """
+        overdue_fee = getattr(self, '_overdue_fee', None)
+        if overdue_fee is None:
+            overdue_fee = 0
+            if self.end_date and not self.car_returned:
+                today = timezone.now().date()
+                if today > self.end_date and self.car and self.car.fee:
+                    days_overdue = (today - self.end_date).days
+                    overdue_fee = self.car.fee * days_overdue
+
+        # Amounts are unset on a booking that has not been saved yet
+        return (self.total_amount or 0) + overdue_fee + (self.accident_charges or 0)
+
     def get_total_balance(self):
         """
         Calculate the remaining balance for the booking.
         Includes overdue fees if applicable.
+
+        Uses the `_balance` annotation when the queryset provided one.
         
         Returns:
             Decimal: Remaining balance (total_amount + overdue_fee - paid_amount)
         """
-        from django.utils import timezone
-        
-        # Calculate overdue fee
-        overdue_fee = 0
-        if self.end_date and not self.car_returned:
-            today = timezone.now().date()
-            if today > self.end_date and self.car and self.car.fee:
-                days_overdue = (today - self.end_date).days
-                overdue_fee = self.car.fee * days_overdue
-        
-        # Total balance = total_amount + overdue_fee + accident_charges - paid_amount
-        return (self.total_amount + overdue_fee + self.accident_charges) - self.paid_amount
+        balance = getattr(self, '_balance', None)
+        if balance is not None:
+            return balance
+        return self.get_total_due() - (self.paid_amount or 0)
 
     def get_total_paid(self):
         """
         Get total amount paid from all payment records.
+
+        Uses the `_total_paid` annotation when the queryset provided one.
         
         Returns:
             Decimal: Sum of all successful payments
         """
+        total_paid = getattr(self, '_total_paid', None)
+        if total_paid is not None:
+            return total_paid
+        if self.pk is None:
+            return 0
         return self.payments.filter(is_successful=True).aggregate(
             total=models.Sum('amount')
         )['total'] or 0
@@ -307,9 +432,23 @@ class Booking(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['booking_status']),
-            models.Index(fields=['payment_status']),
+            # Status lookups are for live and outstanding bookings; closed and
+            # paid ones make up most of the table and are left out
+            models.Index(fields=['booking_status'],
+                         condition=models.Q(booking_status__in=['Active', 'Overdue']),
+                         name='booking_live_status_idx'),
+            models.Index(fields=['payment_status'], condition=~models.Q(payment_status='Paid'),
+                         name='booking_unpaid_idx'),
             models.Index(fields=['start_date', 'end_date']),
+            # Default changelist ordering and date_hierarchy
+            models.Index(fields=['-created_at']),
+            # Overdue checks only look at cars not yet returned
+            models.Index(fields=['end_date'], condition=models.Q(car_returned=False),
+                         name='booking_unreturned_end_idx'),
+            # Overlap lookup in check_car_availability, limited to bookings that hold the car
+            models.Index(fields=['car', 'start_date', 'end_date'],
+                         condition=~models.Q(booking_status__in=['Cancelled', 'Returned']),
+                         name='booking_car_schedule_idx'),
         ]
         constraints = [
             models.CheckConstraint(
@@ -366,40 +505,236 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, 
                                  null=True, related_name='payments_recorded')
+
+    objects = PaymentQuerySet.as_manager()
     
+    @staticmethod
+    def payment_status_for(total_paid, total_due):
+        """
+        Return the booking payment status for the given paid and due amounts.
+
+        Args:
+            total_paid (Decimal): Sum of successful payments.
+            total_due (Decimal): Amount owed before any payment.
+        Returns:
+            str: 'Unpaid', 'Partial' or 'Paid'.
+        """
+        if total_paid == 0:
+            return 'Unpaid'
+        elif total_paid < total_due:
+            return 'Partial'
+        return 'Paid'
+
+    # Booking columns read when updating its totals and by the payment and
+    # booking notifications; the rest, such as the TEXT columns, stay deferred
+    BOOKING_FIELDS = (
+        'booking_id', 'customer', 'car', 'start_date', 'end_date', 'booking_status',
+        'car_returned', 'total_amount', 'accident_charges', 'paid_amount',
+        'payment_status', 'payment_date',
+    )
+
+    def _load_booking(self):
+        """
+        Load the booking with BOOKING_FIELDS and its car, unless it is already loaded.
+        """
+        if self.booking_id and not Payment.booking.is_cached(self):
+            self.booking = Booking.objects.select_related('car').only(
+                *self.BOOKING_FIELDS
+            ).get(pk=self.booking_id)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Load a payment, remembering what it contributed to its booking's paid_amount.
+        """
+        instance = super().from_db(db, field_names, values)
+        if {'booking_id', 'amount', 'is_successful'}.issubset(field_names):
+            instance._loaded_contribution = instance._contribution()
+        return instance
+
+    def _contribution(self):
+        """
+        Return the booking id and the amount this payment adds to its paid_amount.
+        """
+        return self.booking_id, (self.amount if self.is_successful else 0)
+
     def save(self, *args, **kwargs):
         """
         Save the payment and update booking payment status and paid_amount.
+
+        The booking is adjusted by the change in this payment's successful
+        amount, in a single UPDATE and without summing the other payments.
+        A payment moved to another booking is taken off the old one first.
+        A payment whose previous values are unknown has the totals
+        recalculated from all payments.
         """
+        adding = self._state.adding
+        loaded = None if adding else getattr(self, '_loaded_contribution', None)
+        self._load_booking()
         super().save(*args, **kwargs)
-        
-        # Update booking's paid_amount and payment_status
-        booking = self.booking
-        
-        # Calculate total paid from all successful payments
-        total_paid = booking.payments.filter(is_successful=True).aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-        
-        # Update booking
-        booking.paid_amount = total_paid
-        
-        # Calculate total due (including overdue fees)
-        total_due = booking.get_total_balance() + total_paid  # This gives us the original total
-        
-        # Update payment status
-        if total_paid == 0:
-            booking.payment_status = 'Unpaid'
-        elif total_paid < total_due:
-            booking.payment_status = 'Partial'
+
+        booking_id, paid = self._contribution()
+        if loaded is not None and loaded[0] != booking_id:
+            previous_booking_id, previous_paid = loaded
+            if previous_paid:
+                previous_booking = Booking.objects.using(self._state.db).select_related('car').only(
+                    *self.BOOKING_FIELDS
+                ).get(pk=previous_booking_id)
+                self._add_to_booking(previous_booking, -previous_paid, None, self._state.db)
+            loaded = (booking_id, 0)
+        if adding or loaded is not None:
+            delta = paid - (loaded[1] if loaded is not None else 0)
+            if delta:
+                payment_date = self.payment_date if self.is_successful else None
+                self._add_to_booking(self.booking, delta, payment_date, self._state.db)
         else:
-            booking.payment_status = 'Paid'
-        
-        # Update payment date if this is the first payment
-        if not booking.payment_date and self.is_successful:
-            booking.payment_date = self.payment_date
-        
-        booking.save(update_fields=['paid_amount', 'payment_status', 'payment_date'])
+            self._recalculate_booking(self.booking, self._state.db)
+        self._loaded_contribution = (booking_id, paid)
+
+    def delete(self, *args, **kwargs):
+        """
+        Delete the payment and take its successful amount off the booking's paid_amount.
+        """
+        booking_id, paid = getattr(self, '_loaded_contribution', None) or self._contribution()
+        self._load_booking()
+        booking = self.booking
+        using = self._state.db
+        result = super().delete(*args, **kwargs)
+        if paid:
+            self._add_to_booking(booking, -paid, None, using)
+        return result
+
+    @classmethod
+    def recalculate_bookings(cls, booking_ids, using=None):
+        """
+        Recalculate paid_amount and payment_status of the given bookings from their payments.
+
+        Used after bulk deletes and updates, which bypass save() and delete().
+
+        Args:
+            booking_ids (Iterable[int]): Primary keys of the bookings.
+            using (str, optional): Database alias.
+        """
+        if not booking_ids:
+            return
+        bookings = Booking.objects.using(using).select_related('car').only(
+            *cls.BOOKING_FIELDS
+        ).filter(pk__in=booking_ids)
+        for booking in bookings:
+            cls._recalculate_booking(booking, using)
+
+    @staticmethod
+    def _recalculate_booking(booking, using):
+        """
+        Recalculate the booking's paid_amount and payment_status from all payments.
+        """
+        # Sum the successful payments and derive the status in one UPDATE
+        total_paid = total_paid_expression()
+
+        # Calculate total due (including overdue fees); it does not depend on the payments
+        total_due = booking.get_total_due()
+
+        # The first payment date is kept; a booking without one takes the
+        # earliest successful payment's
+        first_payment_date = Payment.objects.filter(
+            booking=models.OuterRef('pk'), is_successful=True,
+        ).order_by('payment_date').values('payment_date')[:1]
+
+        values = {
+            'paid_amount': total_paid,
+            'payment_status': models.Case(
+                models.When(Exact(total_paid, 0), then=models.Value('Unpaid')),
+                models.When(LessThan(total_paid, total_due), then=models.Value('Partial')),
+                default=models.Value('Paid'),
+            ),
+            'payment_date': Coalesce('payment_date', models.Subquery(first_payment_date)),
+        }
+        Booking.objects.using(using).filter(pk=booking.pk).update(**values)
+
+        # The new values are only in the row; drop them and the annotations
+        # derived from them from the loaded booking so they are read back if used
+        for field in (*values, '_balance', '_total_paid'):
+            booking.__dict__.pop(field, None)
+
+        post_save.send(
+            sender=Booking, instance=booking, created=False, raw=False,
+            using=using, update_fields=frozenset(values),
+        )
+
+    @classmethod
+    def bulk_record(cls, booking, payments):
+        """
+        Insert several payments for one booking and update its totals once.
+
+        Intended for imports and instalment plans. The payments are written
+        with a single bulk_create, so save() and post_save do not run for
+        them and no per-payment staff notification is sent.
+
+        Args:
+            booking (Booking): The booking the payments belong to.
+            payments (list[Payment]): Unsaved payments; their booking is set here.
+        Returns:
+            list[Payment]: The created payments.
+        """
+        for payment in payments:
+            payment.booking = booking
+        using = booking._state.db
+        with transaction.atomic(using=using):
+            created = cls.objects.using(using).bulk_create(payments)
+            for payment in created:
+                payment._loaded_contribution = payment._contribution()
+            successful = [payment for payment in created if payment.is_successful]
+            if successful:
+                cls._add_to_booking(
+                    booking, sum(payment.amount for payment in successful),
+                    min(payment.payment_date for payment in successful), using,
+                )
+        return created
+
+    @staticmethod
+    def _add_to_booking(booking, amount, payment_date, using):
+        """
+        Add a change in successful payments to a booking's totals.
+
+        amount is negative when a payment was reduced, failed or deleted.
+        payment_date fills in the booking's first payment date, unless None.
+
+        paid_amount is incremented and the status derived in SQL, so
+        concurrent payments for one booking cannot overwrite each other and
+        the other payments are not summed again. Booking.save() is not
+        called; post_save is sent only when the payment status changes.
+        """
+        previous_status = booking.payment_status
+        # Amount owed before any payment, as in the full recalculation
+        total_due = booking.get_total_due()
+
+        values = {
+            'paid_amount': models.F('paid_amount') + amount,
+            'payment_status': models.Case(
+                models.When(paid_amount=-amount, then=models.Value('Unpaid')),
+                models.When(paid_amount__lt=total_due - amount, then=models.Value('Partial')),
+                default=models.Value('Paid'),
+            ),
+        }
+        if payment_date is not None:
+            values['payment_date'] = Coalesce('payment_date', models.Value(payment_date))
+        Booking.objects.using(using).filter(pk=booking.pk).update(**values)
+
+        # Keep the loaded booking in step with the row
+        booking.paid_amount += amount
+        booking.payment_status = Payment.payment_status_for(booking.paid_amount, total_due)
+        if payment_date is not None and not booking.payment_date:
+            booking.payment_date = payment_date
+        # Annotations loaded with the booking no longer match paid_amount
+        booking.__dict__.pop('_balance', None)
+        booking.__dict__.pop('_total_paid', None)
+
+        # Receivers such as the staff notifications depend on the status
+        if booking.payment_status != previous_status:
+            post_save.send(
+                sender=Booking, instance=booking, created=False, raw=False,
+                using=using, update_fields=frozenset(values),
+            )
     
     def __str__(self):
         """
@@ -415,6 +750,9 @@ class Payment(models.Model):
         indexes = [
             models.Index(fields=['payment_date']),
             models.Index(fields=['payment_method']),
+            # Summing a booking's successful payments reads only this index
+            models.Index(fields=['booking'], condition=models.Q(is_successful=True),
+                         include=['amount'], name='payment_booking_success_idx'),
         ]
         
 class BookingExtension(models.Model):
@@ -465,4 +803,5 @@ class BookingExtension(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['booking', 'new_end_date']),
+            models.Index(fields=['-created_at']),
         ]
@@ -20,7 +20,13 @@ class PaymentSerializer(serializers.ModelSerializer):
     Serializer for booking payments.
 
     Includes all fields and marks created_at and created_by as read-only.
+    The booking is looked up with its customer and car, which Booking.__str__
+    reads for the browsable API form and Payment.save() reads for the balance.
     """
+    booking = serializers.PrimaryKeyRelatedField(
+        queryset=Booking.objects.select_related('customer', 'car')
+    )
+
     class Meta:
         model = Payment
         fields = '__all__'
@@ -89,6 +95,9 @@ class BookingSerializer(serializers.ModelSerializer):
         Returns:
             Decimal: Overdue fee amount, or 0 if not overdue.
         """
+        # Computed in SQL when the queryset used with_balance()
+        if hasattr(obj, '_overdue_fee'):
+            return obj._overdue_fee or 0
         today = timezone.now().date()
         if obj.end_date and today > obj.end_date and not obj.car_returned:
             days_overdue = (today - obj.end_date).days
@@ -254,7 +263,9 @@ class BookingListSerializer(serializers.ModelSerializer):
     dropoff_time = serializers.TimeField(read_only=True)
     booking_status = serializers.SerializerMethodField()
     overdue_fee = serializers.SerializerMethodField()
-    total_paid = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    total_paid = serializers.DecimalField(
+        max_digits=10, decimal_places=2, source='get_total_paid', read_only=True
+    )
     total_balance = serializers.SerializerMethodField()
 
     def get_car_name(self, obj):
@@ -310,6 +321,8 @@ class BookingListSerializer(serializers.ModelSerializer):
         return obj.get_total_balance()
     
     def get_overdue_fee(self, obj):
+        if hasattr(obj, '_overdue_fee'):
+            return obj._overdue_fee or 0
         today = timezone.now().date()
         if obj.end_date and today > obj.end_date and not obj.car_returned:
             days_overdue = (today - obj.end_date).days
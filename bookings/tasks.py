@@ -0,0 +1,66 @@
+import csv
+import io
+import tempfile
+
+from celery import shared_task
+from django.conf import settings
+from django.core.files import File
+from django.core.mail import EmailMessage
+
+from authentication.models import CustomUser
+from core.exports import export_download_url, save_export
+from .models import Booking
+
+# Rows fetched per round trip while streaming a report
+REPORT_CHUNK_SIZE = 2000
+
+REPORT_HEADER = (
+    'booking_id', 'customer', 'customer_email', 'car',
+    'start_date', 'end_date', 'booking_status', 'payment_status',
+    'total_amount', 'paid_amount', 'car_returned', 'created_at',
+)
+REPORT_COLUMNS = (
+    'booking_id', 'customer__name', 'customer__email', 'car__car_name',
+    'start_date', 'end_date', 'booking_status', 'payment_status',
+    'total_amount', 'paid_amount', 'car_returned', 'created_at',
+)
+
+
+@shared_task
+def export_bookings_csv(booking_ids, requester_id):
+    """
+    Write a report of the given bookings to a CSV file and email its link to the requester.
+
+    Rows are streamed from the database in chunks and written to a temporary
+    file, so memory use does not grow with the size of the selection.
+
+    Args:
+        booking_ids (list[int]): Primary keys of the bookings to report on.
+        requester_id (int): Primary key of the staff user who requested the report.
+
+    Returns:
+        str: Storage path of the generated file.
+    """
+    rows = Booking.objects.filter(pk__in=booking_ids).order_by('pk').values_list(*REPORT_COLUMNS)
+
+    with tempfile.TemporaryFile() as report:
+        text = io.TextIOWrapper(report, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(REPORT_HEADER)
+        for row in rows.iterator(chunk_size=REPORT_CHUNK_SIZE):
+            writer.writerow(row)
+        text.flush()
+        report.seek(0)
+
+        path = save_export('bookings', File(report))
+        text.detach()
+
+    requester = CustomUser.objects.filter(pk=requester_id).only('email').first()
+    if requester:
+        EmailMessage(
+            subject="Booking report ready",
+            body=f"Your report of {len(booking_ids)} bookings is available to staff at {export_download_url(path)}",
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[requester.email],
+        ).send(fail_silently=True)
+    return path
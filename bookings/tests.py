@@ -1,3 +1,413 @@
-from django.test import TestCase
+import datetime
+import shutil
+import tempfile
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from cars.models import Car
+from customers.models import Customer
+from .models import Booking, Payment
+from .tasks import export_bookings_csv
+
+
+class PaymentBookingTotalsTests(TestCase):
+    """
+    Payment.save(), delete() and bulk_record() keep the booking's
+    paid_amount and payment_status in step with its successful payments.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.now().date()
+        user = get_user_model().objects.create_user('staff@example.com', 'Staff', 'pw12345678')
+        cls.customer = Customer.objects.create(
+            name='Customer', email='customer@example.com', phone_number='1',
+            gender='Male', date_of_birth=cls.today, address='Address', user=user,
+        )
+        cls.car = Car.objects.create(
+            car_name='Car', fee=Decimal('100'), tracker_expiry_date=cls.today, color='Red',
+            seats=4, mileage='1', type='SUV', gearbox='Manual', max_speed='1',
+            insurance_expiry_date=cls.today,
+        )
+
+    def create_booking(self, start_offset=1, end_offset=3, total_amount=Decimal('300')):
+        return Booking.objects.create(
+            customer=self.customer, car=self.car,
+            start_date=self.today + datetime.timedelta(days=start_offset),
+            end_date=self.today + datetime.timedelta(days=end_offset),
+            subtotal=total_amount, total_amount=total_amount,
+        )
+
+    def pay(self, booking, amount, **kwargs):
+        kwargs.setdefault('payment_date', self.today)
+        return Payment.objects.create(
+            booking=booking, amount=Decimal(amount), payment_method='Cash', **kwargs
+        )
+
+    def assertTotals(self, booking, paid_amount, payment_status):
+        booking.refresh_from_db()
+        self.assertEqual(booking.paid_amount, Decimal(paid_amount))
+        self.assertEqual(booking.payment_status, payment_status)
+
+    def test_create_adds_successful_payments_only(self):
+        booking = self.create_booking()
+        self.pay(booking, '100')
+        self.assertTotals(booking, '100', 'Partial')
+        self.assertEqual(booking.payment_date, self.today)
+
+        self.pay(booking, '50', is_successful=False)
+        self.assertTotals(booking, '100', 'Partial')
+
+    def test_amount_change_applies_the_difference(self):
+        booking = self.create_booking()
+        payment = self.pay(booking, '100')
+        self.pay(booking, '50')
+
+        payment.amount = Decimal('250')
+        payment.save()
+        self.assertTotals(booking, '300', 'Paid')
+
+        payment = Payment.objects.get(pk=payment.pk)
+        payment.amount = Decimal('10')
+        payment.save()
+        self.assertTotals(booking, '60', 'Partial')
+
+    def test_toggling_success_adds_and_removes_the_amount(self):
+        booking = self.create_booking()
+        payment = self.pay(booking, '300')
+        self.assertTotals(booking, '300', 'Paid')
+
+        payment.is_successful = False
+        payment.save()
+        self.assertTotals(booking, '0', 'Unpaid')
+
+        payment.is_successful = True
+        payment.save()
+        self.assertTotals(booking, '300', 'Paid')
+
+    def test_moving_payment_recalculates_both_bookings(self):
+        first = self.create_booking()
+        second = self.create_booking(start_offset=10, end_offset=12)
+        payment = self.pay(first, '100')
+
+        payment.booking = second
+        payment.save()
+        self.assertTotals(first, '0', 'Unpaid')
+        self.assertTotals(second, '100', 'Partial')
+
+    def test_delete_subtracts_the_payment(self):
+        booking = self.create_booking()
+        kept = self.pay(booking, '100')
+        removed = self.pay(booking, '200')
+        failed = self.pay(booking, '40', is_successful=False)
+        self.assertTotals(booking, '300', 'Paid')
+
+        Payment.objects.get(pk=removed.pk).delete()
+        self.assertTotals(booking, '100', 'Partial')
+
+        failed.delete()
+        self.assertTotals(booking, '100', 'Partial')
+
+        kept.delete()
+        self.assertTotals(booking, '0', 'Unpaid')
+
+    def test_bulk_record_updates_totals_once(self):
+        booking = self.create_booking()
+        later = self.today + datetime.timedelta(days=1)
+        created = Payment.bulk_record(booking, [
+            Payment(amount=Decimal('100'), payment_date=self.today, payment_method='Cash'),
+            Payment(amount=Decimal('50'), payment_date=self.today, payment_method='Cash',
+                    is_successful=False),
+            Payment(amount=Decimal('150'), payment_date=later, payment_method='Cash'),
+        ])
+
+        self.assertEqual(len(created), 3)
+        self.assertEqual(booking.payments.count(), 3)
+        self.assertEqual((booking.paid_amount, booking.payment_status), (Decimal('250'), 'Partial'))
+        self.assertTotals(booking, '250', 'Partial')
+        self.assertEqual(booking.payment_date, self.today)
+
+        # Saved again later, a recorded payment only applies its change
+        failed = created[1]
+        failed.is_successful = True
+        failed.save()
+        self.assertTotals(booking, '300', 'Paid')
+
+    def test_bulk_record_takes_earliest_payment_date(self):
+        booking = self.create_booking()
+        earlier = self.today - datetime.timedelta(days=3)
+        Payment.bulk_record(booking, [
+            Payment(amount=Decimal('100'), payment_date=self.today, payment_method='Cash'),
+            Payment(amount=Decimal('50'), payment_date=earlier, payment_method='Cash'),
+        ])
+        self.assertEqual(booking.payment_date, earlier)
+        booking.refresh_from_db()
+        self.assertEqual(booking.payment_date, earlier)
+
+    def test_bulk_delete_recalculates_bookings(self):
+        booking = self.create_booking()
+        self.pay(booking, '100')
+        removed = self.pay(booking, '200')
+        self.assertTotals(booking, '300', 'Paid')
+
+        Payment.objects.filter(pk=removed.pk).delete()
+        self.assertTotals(booking, '100', 'Partial')
+
+        # Later payments apply their change to the corrected totals
+        self.pay(booking, '50')
+        self.assertTotals(booking, '150', 'Partial')
+
+    def test_bulk_update_recalculates_bookings(self):
+        first = self.create_booking()
+        second = self.create_booking(start_offset=10, end_offset=12)
+        payment = self.pay(first, '100')
+        self.pay(second, '100')
+
+        Payment.objects.filter(pk=payment.pk).update(amount=Decimal('300'))
+        self.assertTotals(first, '300', 'Paid')
+
+        Payment.objects.filter(booking=first).update(is_successful=False)
+        self.assertTotals(first, '0', 'Unpaid')
+
+        Payment.objects.filter(pk=payment.pk).update(is_successful=True, booking=second)
+        self.assertTotals(first, '0', 'Unpaid')
+        self.assertTotals(second, '400', 'Paid')
+
+    def test_admin_delete_selected_recalculates_bookings(self):
+        admin_user = get_user_model().objects.create_superuser(
+            'admin@example.com', 'Admin', 'pw12345678'
+        )
+        self.client.force_login(admin_user)
+        booking = self.create_booking()
+        self.pay(booking, '100')
+        removed = self.pay(booking, '200')
+
+        response = self.client.post(reverse('admin:bookings_payment_changelist'), {
+            'action': 'delete_selected',
+            '_selected_action': [removed.pk],
+            'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Payment.objects.filter(pk=removed.pk).exists())
+        self.assertTotals(booking, '100', 'Partial')
+
+    def test_status_transitions(self):
+        booking = self.create_booking()
+        self.assertTotals(booking, '0', 'Unpaid')
+        self.pay(booking, '299.99')
+        self.assertTotals(booking, '299.99', 'Partial')
+        self.pay(booking, '0.01')
+        self.assertTotals(booking, '300', 'Paid')
+
+    def test_overpayment_is_paid(self):
+        booking = self.create_booking()
+        self.pay(booking, '500')
+        self.assertTotals(booking, '500', 'Paid')
+        booking.refresh_from_db()
+        self.assertEqual(booking.get_total_balance(), Decimal('-200'))
+
+    def test_overdue_fee_is_owed_before_paid(self):
+        # Unreturned two days past its end date: 300 + 2 days * 100 due
+        booking = self.create_booking(start_offset=-5, end_offset=-2)
+        self.assertEqual(booking.get_total_due(), Decimal('500'))
+
+        self.pay(booking, '300')
+        self.assertTotals(booking, '300', 'Partial')
+        self.pay(booking, '200')
+        self.assertTotals(booking, '500', 'Paid')
+
+    def test_annotated_booking_keeps_status_right(self):
+        booking = self.create_booking()
+        booking = Booking.objects.with_balance().with_total_paid().get(pk=booking.pk)
+        for amount in ('100', '100', '100'):
+            Payment.bulk_record(booking, [
+                Payment(amount=Decimal(amount), payment_date=self.today, payment_method='Cash'),
+            ])
+        self.assertEqual(booking.payment_status, 'Paid')
+        self.assertEqual(booking.get_total_balance(), 0)
+        self.assertTotals(booking, '300', 'Paid')
+
+    def test_single_post_save_on_status_change(self):
+        booking = self.create_booking()
+        sent = []
+
+        def receiver(sender, instance, **kwargs):
+            sent.append((instance.pk, kwargs['update_fields']))
+
+        post_save.connect(receiver, sender=Booking)
+        self.addCleanup(post_save.disconnect, receiver, sender=Booking)
+
+        self.pay(booking, '100')
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(sent[0][0], booking.pk)
+        self.assertIn('payment_status', sent[0][1])
+        self.assertIn('paid_amount', sent[0][1])
+
+        # Still Partial: no status change, no signal
+        self.pay(booking, '100')
+        self.assertEqual(len(sent), 1)
+
+        self.pay(booking, '100')
+        self.assertEqual(len(sent), 2)
+
+
+class BookingExportTests(TestCase):
+    """
+    export_bookings_csv stores the report privately and serves it to staff only.
+    """
+
+    def setUp(self):
+        export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_root)
+        settings_override = override_settings(EXPORT_ROOT=export_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        today = timezone.now().date()
+        self.staff = get_user_model().objects.create_superuser(
+            'admin@example.com', 'Admin', 'pw12345678'
+        )
+        customer = Customer.objects.create(
+            name='Customer', email='customer@example.com', phone_number='1',
+            gender='Male', date_of_birth=today, address='Address',
+        )
+        car = Car.objects.create(
+            car_name='Car', fee=Decimal('100'), tracker_expiry_date=today, color='Red',
+            seats=4, mileage='1', type='SUV', gearbox='Manual', max_speed='1',
+            insurance_expiry_date=today,
+        )
+        self.booking = Booking.objects.create(
+            customer=customer, car=car, start_date=today,
+            end_date=today + datetime.timedelta(days=2),
+            subtotal=Decimal('200'), total_amount=Decimal('200'),
+        )
+
+    def test_report_is_served_to_staff_only(self):
+        name = export_bookings_csv([self.booking.pk], self.staff.pk)
+        url = mail.outbox[-1].body.rsplit(' at ', 1)[1].strip()
+        self.assertEqual(url, f'/exports/{name}/')
+        self.assertTrue(name.startswith('bookings-'))
+
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 2)
+        self.assertIn(self.booking.booking_id, rows[1])
+
+
+class BookingAdminStatusActionTests(TestCase):
+    """
+    The locked status actions update bookings and cars together and notify receivers after commit.
+    """
+
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.admin_user = get_user_model().objects.create_superuser(
+            'admin@example.com', 'Admin', 'pw12345678'
+        )
+        self.client.force_login(self.admin_user)
+        self.customer = Customer.objects.create(
+            name='Customer', email='customer@example.com', phone_number='1',
+            gender='Male', date_of_birth=self.today, address='Address',
+        )
+        self.car = Car.objects.create(
+            car_name='Car', fee=Decimal('100'), tracker_expiry_date=self.today, color='Red',
+            seats=4, mileage='1', type='SUV', gearbox='Manual', max_speed='1',
+            insurance_expiry_date=self.today,
+        )
+        self.sent = []
+
+        def receiver(sender, instance, **kwargs):
+            self.sent.append((instance.pk, instance.booking_status, kwargs['update_fields']))
+
+        post_save.connect(receiver, sender=Booking)
+        self.addCleanup(post_save.disconnect, receiver, sender=Booking)
+
+    def create_booking(self, start_offset, end_offset, **kwargs):
+        return Booking.objects.create(
+            customer=self.customer, car=self.car,
+            start_date=self.today + datetime.timedelta(days=start_offset),
+            end_date=self.today + datetime.timedelta(days=end_offset),
+            subtotal=Decimal('100'), total_amount=Decimal('100'), **kwargs
+        )
+
+    def run_action(self, action, bookings):
+        self.sent.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('admin:bookings_booking_changelist'), {
+                'action': action,
+                '_selected_action': [booking.pk for booking in bookings],
+            }, follow=True)
+
+    def test_mark_returned(self):
+        booking = self.create_booking(0, 2)
+        updated_at = booking.updated_at
+        Car.objects.filter(pk=self.car.pk).update(availability='Booked', status='Booked')
+
+        response = self.run_action('mark_returned', [booking])
+        self.assertContains(response, '1 bookings marked as returned')
+        booking.refresh_from_db()
+        self.assertEqual(booking.booking_status, 'Returned')
+        self.assertTrue(booking.car_returned)
+        self.assertEqual(booking.actual_return_date, self.today)
+        self.assertGreater(booking.updated_at, updated_at)
+        self.car.refresh_from_db()
+        self.assertEqual((self.car.availability, self.car.status), ('Available', 'Active'))
+        self.assertEqual(self.sent, [(booking.pk, 'Returned', frozenset(
+            {'car_returned', 'booking_status', 'actual_return_date', 'updated_at'}
+        ))])
+
+        # Already returned: nothing to do, nothing sent
+        response = self.run_action('mark_returned', [booking])
+        self.assertContains(response, '0 bookings marked as returned')
+        self.assertEqual(self.sent, [])
+
+    def test_mark_cancelled_skips_closed_bookings(self):
+        live = self.create_booking(0, 2)
+        returned = self.create_booking(5, 7, booking_status='Returned', car_returned=True)
+
+        response = self.run_action('mark_cancelled', [live, returned])
+        self.assertContains(response, '1 bookings cancelled')
+        live.refresh_from_db()
+        returned.refresh_from_db()
+        self.assertEqual(live.booking_status, 'Cancelled')
+        self.assertEqual(returned.booking_status, 'Returned')
+        self.assertEqual([pk for pk, _, _ in self.sent], [live.pk])
+
+    def test_mark_active_keeps_earliest_of_overlapping_selection(self):
+        later = self.create_booking(2, 6, booking_status='Cancelled')
+        earlier = self.create_booking(1, 4, booking_status='Cancelled')
+        separate = self.create_booking(10, 12, booking_status='Cancelled')
+
+        response = self.run_action('mark_active', [later, earlier, separate])
+        self.assertContains(response, '2 bookings marked as active')
+        self.assertContains(response, '1 bookings skipped')
+        statuses = dict(Booking.objects.values_list('pk', 'booking_status'))
+        self.assertEqual(statuses[earlier.pk], 'Active')
+        self.assertEqual(statuses[separate.pk], 'Active')
+        self.assertEqual(statuses[later.pk], 'Cancelled')
+        self.assertEqual(sorted(pk for pk, _, _ in self.sent), sorted([earlier.pk, separate.pk]))
+        self.car.refresh_from_db()
+        self.assertEqual(self.car.availability, 'Booked')
+
+    def test_mark_active_skips_bookings_clashing_with_live_ones(self):
+        self.create_booking(0, 3)
+        clashing = self.create_booking(10, 12, booking_status='Cancelled')
+        Booking.objects.filter(pk=clashing.pk).update(
+            start_date=self.today + datetime.timedelta(days=1)
+        )
+
+        response = self.run_action('mark_active', [clashing])
+        self.assertContains(response, '0 bookings marked as active')
+        clashing.refresh_from_db()
+        self.assertEqual(clashing.booking_status, 'Cancelled')
+        self.assertEqual(self.sent, [])
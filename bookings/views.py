@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import serializers
 from django_filters.rest_framework import DjangoFilterBackend
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.utils import timezone
 from django.db.models import Q
 from .models import Booking, Payment, BookingExtension
@@ -40,7 +41,7 @@ class BookingViewSet(viewsets.ModelViewSet):
     """
     queryset = Booking.objects.all().select_related(
         'customer', 'car', 'original_car', 'created_by'
-    ).prefetch_related('payments', 'extensions')
+    )
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['booking_status', 'payment_status', 'car_returned']
     search_fields = ['booking_id', 'customer__name', 'car__car_name']
@@ -79,18 +80,19 @@ class BookingViewSet(viewsets.ModelViewSet):
         """
         queryset = super().get_queryset()
         
-        # Annotate with total paid amount for better performance
-        from django.db.models import Sum, Case, When, DecimalField
-        
-        queryset = queryset.annotate(
-            total_paid=Case(
-                When(payments__is_successful=True, 
-                     then=Sum('payments__amount')),
-                default=0,
-                output_field=DecimalField(max_digits=10, decimal_places=2)
-            )
-        )
-        
+        # Sum successful payments in a subquery so get_total_paid() does not
+        # query per booking
+        queryset = queryset.with_total_paid()
+
+        # Only the full serializer nests payments and extensions
+        if getattr(self, 'action', None) != 'list':
+            queryset = queryset.prefetch_related('payments', 'extensions')
+
+        # Balances for listings are computed in SQL; detail actions change
+        # the booking before serializing it, so they keep the Python path
+        if not getattr(self, 'detail', False):
+            queryset = queryset.with_balance()
+
         # Exclude reserved bookings by default
         if getattr(self, 'action', None) == 'list':
             queryset = queryset.exclude(car__isnull=True)
@@ -188,7 +190,15 @@ class BookingViewSet(viewsets.ModelViewSet):
                 "message": extract_error_message(exc.detail),
                 "status_code": 409
             }, status=409)
-        booking = serializer.save(created_by=self.request.user)
+        try:
+            booking = serializer.save(created_by=self.request.user)
+        except DjangoValidationError as exc:
+            # Another request booked the car between validation and the insert
+            return Response({
+                "data": None,
+                "message": exc.messages[0],
+                "status_code": 409
+            }, status=409)
 
         # Only update car if it exists
         if booking.car:
@@ -251,7 +261,14 @@ class BookingViewSet(viewsets.ModelViewSet):
                     "status_code": status.HTTP_400_BAD_REQUEST
                 }, status=status.HTTP_400_BAD_REQUEST)
                 
-            booking.swap_car(new_car, reason)
+            try:
+                booking.swap_car(new_car, reason)
+            except DjangoValidationError as exc:
+                return Response({
+                    "data": None,
+                    "message": exc.messages[0],
+                    "status_code": status.HTTP_409_CONFLICT
+                }, status=status.HTTP_409_CONFLICT)
             
             return Response({
                 "data": BookingSerializer(booking).data,
@@ -291,13 +308,20 @@ class BookingViewSet(viewsets.ModelViewSet):
             reason = serializer.validated_data.get('reason', '')
             remarks = serializer.validated_data.get('remarks', '')
             
-            booking.extend(
-                new_end_date=new_end_date,
-                extension_fee=extension_fee,
-                reason=reason,
-                remarks=remarks,
-                user=request.user
-            )
+            try:
+                booking.extend(
+                    new_end_date=new_end_date,
+                    extension_fee=extension_fee,
+                    reason=reason,
+                    remarks=remarks,
+                    user=request.user
+                )
+            except DjangoValidationError as exc:
+                return Response({
+                    "data": None,
+                    "message": exc.messages[0],
+                    "status_code": status.HTTP_409_CONFLICT
+                }, status=status.HTTP_409_CONFLICT)
             
             return Response({
                 "data": BookingSerializer(booking).data,
@@ -334,13 +358,14 @@ class BookingViewSet(viewsets.ModelViewSet):
         booking.car_returned = True
         booking.booking_status = 'Returned'
         booking.actual_return_date = actual_return_date
-        booking.save()
+        # Car and dates are unchanged, so the save skips the availability check
+        booking.save(update_fields=['car_returned', 'booking_status', 'actual_return_date', 'updated_at'])
         
         # Update car availability
         car = booking.car
         car.availability = 'Available'
         car.status = 'Active'
-        car.save()
+        car.save(update_fields=['availability', 'status', 'updated_at'])
         
         return Response({
             "data": BookingSerializer(booking).data,
@@ -447,7 +472,8 @@ class BookingViewSet(viewsets.ModelViewSet):
         booking.accident_description = serializer.validated_data['accident_description']
         booking.accident_date = serializer.validated_data['accident_date']
         booking.accident_charges = serializer.validated_data['accident_charges']
-        booking.save()
+        booking.save(update_fields=['has_accident', 'accident_description', 'accident_date',
+                                    'accident_charges', 'updated_at'])
 
         # Handle car swap if requested
         new_car_id = serializer.validated_data.get('new_car_id')
@@ -465,6 +491,12 @@ class BookingViewSet(viewsets.ModelViewSet):
                     "message": "Replacement car not found or not available",
                     "status_code": status.HTTP_400_BAD_REQUEST
                 }, status=status.HTTP_400_BAD_REQUEST)
+            except DjangoValidationError as exc:
+                return Response({
+                    "data": None,
+                    "message": exc.messages[0],
+                    "status_code": status.HTTP_409_CONFLICT
+                }, status=status.HTTP_409_CONFLICT)
 
         return Response({
             "data": BookingSerializer(booking).data,
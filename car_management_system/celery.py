@@ -0,0 +1,19 @@
+"""
+Celery application for car_management_system project.
+
+Tasks are discovered from each installed app's ``tasks.py`` and configured
+from the ``CELERY_*`` entries in Django settings.
+
+For more information on this file, see
+https://docs.celeryq.dev/en/stable/django/first-steps-with-django.html
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'car_management_system.settings')
+
+app = Celery('car_management_system')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -138,10 +138,32 @@ else:
             'PASSWORD': os.getenv('DB_PASSWORD', 'admin'),
             'HOST': os.getenv('DB_HOST', 'localhost'),
             'PORT': os.getenv('DB_PORT', '5432'),
+            # Keep connections open across requests instead of reconnecting each time
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+            'CONN_HEALTH_CHECKS': True,
         }
     }
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/#using-argon2-with-django
+# Argon2id is used for new hashes; existing PBKDF2 hashes are upgraded on the
+# user's next successful login.
+# When AUTH_PEPPER is set, new hashes use the peppered Argon2id hasher with
+# lighter parameters. The pepper must never change or be dropped once
+# hashes have been made with it.
+AUTH_PEPPER = os.getenv('AUTH_PEPPER')
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if AUTH_PEPPER:
+    PASSWORD_HASHERS.insert(0, 'authentication.hashers.PepperedArgon2PasswordHasher')
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -191,6 +213,10 @@ WHITENOISE_AUTOREFRESH = True
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# payment_booking_success_idx covers the amount column with INCLUDE, which
+# targets PostgreSQL; SQLite builds it without the included column
+SILENCED_SYSTEM_CHECKS = ['models.W040']
+
 # CSRF and Session cookies - only for HTTPS
 CSRF_COOKIE_SECURE = not DEBUG  # Only secure in production
 SESSION_COOKIE_SECURE = not DEBUG  # Only secure in production
@@ -211,10 +237,19 @@ X_FRAME_OPTIONS = 'DENY'
 # Custom user model
 AUTH_USER_MODEL = 'authentication.CustomUser'
 
+# Email login for the admin and any other authenticate() caller
+AUTHENTICATION_BACKENDS = [
+    'authentication.backends.EmailBackend',
+]
+
 #drf and simplejwt
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
 }
 
@@ -233,6 +268,7 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
+    'TOKEN_REFRESH_SERIALIZER': 'authentication.serializers.CachedBlacklistTokenRefreshSerializer',
 }
 
 
@@ -242,6 +278,10 @@ SIMPLE_JWT = {
 MEDIA_URL = '/media/'  # URL to serve media files
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media') # Directory where media files are stored
 
+# Generated exports (user and booking CSVs) contain personal data; they are
+# stored outside MEDIA_ROOT and downloaded through the staff-only export view
+EXPORT_ROOT = os.environ.get('EXPORT_ROOT', os.path.join(BASE_DIR, 'exports'))
+
 # Firebase settings 
 # Firebase credentials path
 # This should point to the JSON file downloaded from Firebase Console
@@ -262,6 +302,33 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
 # This is the email address that will appear as the sender of the emails
 
+# Cache settings
+# Uses the Redis service from docker-compose when REDIS_URL is set,
+# otherwise falls back to a per-process in-memory cache.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Celery settings
+# Broker is the Redis service from docker-compose. Without a broker URL
+# tasks run inline in the calling process, which keeps local setups working.
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False' if CELERY_BROKER_URL else 'True') == 'True'
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_TIMEZONE = TIME_ZONE
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', '').split(',')
 CORS_ALLOW_CREDENTIALS = True  # Allow cookies to be included in cross-origin requests
@@ -26,6 +26,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
 from django.shortcuts import redirect
+from core.views import download_export
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -70,6 +71,9 @@ urlpatterns = [
     # Root endpoint
     path('', api_root, name='api_root'),
     
+    # Staff-only downloads of generated exports
+    path('exports/<str:name>/', download_export, name='export_download'),
+
     # Admin panel
     path('admin/', admin.site.urls),
     
@@ -0,0 +1,51 @@
+""" Private Storage for Generated Exports """
+import os
+import secrets
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.urls import reverse
+from django.utils import timezone
+
+
+class ExportStorage(FileSystemStorage):
+    """
+    File storage under settings.EXPORT_ROOT, with no public URL.
+
+    Exports hold personal data, so they live outside MEDIA_ROOT (served by
+    nginx without authentication) and are only read by download_export.
+    The root is read on each access so override_settings applies to it.
+    """
+
+    @property
+    def base_location(self):
+        return settings.EXPORT_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+export_storage = ExportStorage()
+
+
+def save_export(prefix, content):
+    """
+    Store a generated CSV export under an unguessable name.
+
+    Args:
+        prefix (str): Kind of export, e.g. 'users'.
+        content (File): The file contents.
+
+    Returns:
+        str: Storage name of the saved file.
+    """
+    name = f"{prefix}-{timezone.now().strftime('%Y%m%d%H%M%S')}-{secrets.token_urlsafe(16)}.csv"
+    return export_storage.save(name, content)
+
+
+def export_download_url(name):
+    """
+    Return the path of the staff-only download view for a saved export.
+    """
+    return reverse('export_download', args=[name])
@@ -0,0 +1,33 @@
+""" Admin Pagination """
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+
+
+class FasterAdminPaginator(Paginator):
+    """
+    Paginator that uses PostgreSQL's planner estimate for unfiltered changelists.
+
+    Falls back to an exact COUNT(*) when the changelist is filtered, on other
+    database backends, or when the table is small enough for the estimate to be
+    unreliable.
+    """
+    ESTIMATE_THRESHOLD = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where or connection.vendor != 'postgresql':
+            return super().count
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [self.object_list.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+
+        estimate = row[0] if row else -1
+        if estimate < self.ESTIMATE_THRESHOLD:
+            return super().count
+        return estimate
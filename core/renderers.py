@@ -0,0 +1,31 @@
+""" JSON Rendering """
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+# Dates are handed to DRF's encoder so their format matches JSONRenderer
+_ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that serializes with orjson.
+
+    Types orjson does not handle natively (Decimal, lazy strings, dates) go
+    through DRF's JSONEncoder, so the output matches JSONRenderer. Indented
+    output, as requested by the browsable API, is left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into JSON, returning a bytestring.
+        """
+        if data is None:
+            return b''
+
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=self.encoder_class().default, option=_ORJSON_OPTIONS)
+
+        # Escape \u2028 and \u2029 as JSONRenderer does
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,19 @@
+import os
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
+
+from .exports import export_storage
+
+
+@staff_member_required
+def download_export(request, name):
+    """
+    Send a generated export to a signed-in staff user as an attachment.
+
+    Raises:
+        Http404: If no export has this name.
+    """
+    if name != os.path.basename(name) or not export_storage.exists(name):
+        raise Http404("Export not found")
+    return FileResponse(export_storage.open(name, 'rb'), as_attachment=True, filename=name)